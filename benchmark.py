@@ -4,8 +4,10 @@ import os
 import threading
 import sys
 from server import KVServer
-from client import KVClient
+from client import KVClient, KVClientPool
 import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 def safe_rmtree(path, retries=30, delay=0.2):
     import shutil, time, os
     if not os.path.exists(path):
@@ -24,6 +26,36 @@ def safe_rmtree(path, retries=30, delay=0.2):
     except:
         pass
 
+def prepopulate(port, data_size, batch_size=1000, num_clients=8):
+    """Load key_0..key_{data_size-1} with BulkSet from several connections at once."""
+    # One connection per worker thread, so batches don't queue behind each other
+    clients = KVClientPool(port=port)
+    
+    def load(start):
+        batch = [(f"key_{j}", f"value_{j}") for j in range(start, min(start + batch_size, data_size))]
+        clients.get().BulkSet(batch)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=num_clients) as pool:
+            # list() re-raises the first worker exception, if any
+            list(pool.map(load, range(0, data_size, batch_size)))
+    finally:
+        clients.close()
+
+
+def find_missing_keys(port, keys, num_clients=8):
+    """Get every key over several long-lived connections; return the keys that came back None."""
+    def check(worker):
+        client = KVClient(port=port)
+        try:
+            return [key for key in keys[worker::num_clients] if client.Get(key) is None]
+        finally:
+            client.close()
+    
+    with ThreadPoolExecutor(max_workers=num_clients) as pool:
+        return [key for missing in pool.map(check, range(num_clients)) for key in missing]
+
+
 def benchmark_write_throughput():
     """Benchmark write throughput with varying data sizes."""
     import shutil
@@ -58,10 +90,7 @@ def benchmark_write_throughput():
         # Pre-populate data using BulkSet (this is just setup, not measured)
         if data_size > 0:
             print(f"Pre-populating with {data_size:,} keys...", end=" ", flush=True)
-            batch_size = 1000
-            for i in range(0, data_size, batch_size):
-                batch = [(f"key_{j}", f"value_{j}") for j in range(i, min(i + batch_size, data_size))]
-                client.BulkSet(batch)
+            prepopulate(bench_port, data_size)
             print("Done!")
         
         # Benchmark INDIVIDUAL writes (realistic workload)
@@ -78,10 +107,40 @@ def benchmark_write_throughput():
         
         print("Done!")
         
+        # Benchmark WINDOWED writes: individual Sets with up to `window` replies outstanding
+        window = 64
+        print(f"Benchmarking {num_writes:,} WINDOWED writes (window={window})...", end=" ", flush=True)
+        
+        start_time = time.time()
+        for i in range(num_writes):
+            client.SetAsync(f"win_key_{i}", f"win_value_{i}")
+            if (i + 1) % window == 0:
+                client.drain(window)
+        client.drain()
+        end_time = time.time()
+        
+        windowed_throughput = num_writes / (end_time - start_time)
+        
+        print("Done!")
+        
+        # Benchmark PIPELINED writes (same volume, one fsync per group)
+        print(f"Benchmarking {num_writes:,} PIPELINED writes...", end=" ", flush=True)
+        items = [(f"pipe_key_{i}", f"pipe_value_{i}") for i in range(num_writes)]
+        
+        start_time = time.time()
+        client.PipelineSet(items, flush_every=256)
+        end_time = time.time()
+        
+        pipelined_throughput = num_writes / (end_time - start_time)
+        
+        print("Done!")
+        
         results.append({
             'data_size': data_size,
             'elapsed': elapsed,
-            'throughput': throughput
+            'throughput': throughput,
+            'windowed_throughput': windowed_throughput,
+            'pipelined_throughput': pipelined_throughput
         })
         
         client.close()
@@ -93,15 +152,17 @@ def benchmark_write_throughput():
     print("\n" + "="*70)
     print("WRITE THROUGHPUT RESULTS (Individual Set() Operations)")
     print("="*70)
-    print(f"{'Existing Keys':>15} | {'Elapsed Time':>15} | {'Throughput':>20}")
-    print("-" * 70)
+    print(f"{'Existing Keys':>13} | {'Elapsed':>8} | {'Individual':>18} | {'Windowed':>18} | {'Pipelined':>18}")
+    print("-" * 87)
     
     baseline_throughput = None
     for result in results:
         data_size = f"{result['data_size']:,}"
         elapsed = f"{result['elapsed']:.2f}s"
         throughput = f"{result['throughput']:.2f} writes/sec"
-        print(f"{data_size:>15} | {elapsed:>15} | {throughput:>20}")
+        windowed = f"{result['windowed_throughput']:,.0f} writes/sec"
+        pipelined = f"{result['pipelined_throughput']:,.0f} writes/sec"
+        print(f"{data_size:>13} | {elapsed:>8} | {throughput:>18} | {windowed:>18} | {pipelined:>18}")
         
         if baseline_throughput is None:
             baseline_throughput = result['throughput']
@@ -125,7 +186,7 @@ def benchmark_write_throughput():
         print(f"     - Write to WAL file")
         print(f"     - fsync() to physical disk")
         print(f"     - Response back to client")
-        print(f"\n  ⚡ For batch operations, use BulkSet() for 10-50x better throughput")
+        print(f"\n  ⚡ For batch operations, use BulkSet() or PipelineSet() for 10-50x better throughput")
     
     print("="*70)
     
@@ -149,9 +210,10 @@ def benchmark_durability():
         safe_rmtree(bench_dir)
     
     num_crashes = 5
+    write_rate = 333  # Target writes/sec for the writer thread
     
-    acknowledged = set()
-    acknowledged_lock = threading.Lock()
+    # deque.append/len are atomic, so the writer records acks without a lock
+    acknowledged = deque()
     
     stop_flag = threading.Event()
     crash_count = 0
@@ -203,17 +265,23 @@ def benchmark_durability():
         i = 0
         reconnect_attempts = 0
         max_reconnect = 3
+        period = 1.0 / write_rate
+        next_send = time.monotonic()
         
         while not stop_flag.is_set():
             try:
                 key = f"key_{i}"
                 value = f"value_{i}"
                 if client.Set(key, value):
-                    with acknowledged_lock:
-                        acknowledged.add(key)
+                    acknowledged.append(key)
                     reconnect_attempts = 0  # Reset on success
                 i += 1
-                time.sleep(0.003)  # Small delay
+                # Pace against the monotonic clock, so a slow Set shortens the
+                # next sleep instead of lowering the overall rate
+                next_send += period
+                remaining = next_send - time.monotonic()
+                if remaining > 0:
+                    time.sleep(remaining)
             except Exception as e:
                 # Server might be restarting
                 reconnect_attempts += 1
@@ -235,6 +303,9 @@ def benchmark_durability():
                             break
                         except:
                             time.sleep(1.0)
+                
+                # Don't try to catch up the sends missed while the server was down
+                next_send = time.monotonic()
     
     def killer_thread():
         """Kill and restart server randomly - ACTUAL PROCESS KILL."""
@@ -255,8 +326,7 @@ def benchmark_durability():
                 current_crash = crash_count
             
             # Record state before crash
-            with acknowledged_lock:
-                pre_crash_count = len(acknowledged)
+            pre_crash_count = len(acknowledged)
             
             print(f"  💀 Crash #{current_crash}/{num_crashes}: KILLING server process (had {pre_crash_count:,} writes)...")
             
@@ -360,19 +430,14 @@ def benchmark_durability():
                 current_process[0].kill()
         return {'crashes': crash_count, 'acknowledged': 0, 'lost': 0, 'durability': 0}
     
-    with acknowledged_lock:
-        acked_keys = list(acknowledged)
+    # Writer has stopped; dedupe in case a key was acked twice across a retry
+    acked_keys = list(dict.fromkeys(acknowledged))
     
     print(f"  Verifying {len(acked_keys):,} acknowledged writes...")
     
     # Detailed verification
-    lost_keys = []
-    for key in acked_keys:
-        value = client.Get(key)
-        if value is None:
-            lost_keys.append(key)
-    
     client.close()
+    lost_keys = find_missing_keys(bench_port, acked_keys)
     
     # Kill final server
     with process_lock:
@@ -1,9 +1,27 @@
 import socket
-import json
+import re
 import threading
-from typing import Optional, List, Tuple, Dict, Any
+from collections import deque
+from typing import Optional, List, Tuple, Dict, Any, Deque
+from codec import dumps as _dumps, loads as _loads
 
 
+# Kernel socket buffers large enough to absorb bursts of pipelined requests
+SOCKET_BUFFER_SIZE = 1 << 20
+
+# Pre-encoded frames for the hot Set/Get paths; only valid for strings that
+# need no JSON escaping, everything else goes through _dumps
+_NEEDS_ESCAPE = re.compile(r'[\x00-\x1f"\\\ud800-\udfff]')
+_SET_PREFIX = b'{"command":"set","key":"'
+_SET_MID = b'","value":"'
+_GET_PREFIX = b'{"command":"get","key":"'
+_FRAME_END = b'"}\n'
+
+
+def _plain(s) -> bool:
+    """True if s can be embedded in a JSON string literal as-is."""
+    return type(s) is str and _NEEDS_ESCAPE.search(s) is None
+
 
 class KVClient:
     """Client for the key-value store."""
@@ -12,42 +30,98 @@ class KVClient:
         self.host = host
         self.port = port
         self.socket = None
-        self.buffer = b""
+        self.rfile = None
+        self.wfile = None
+        self._next_id = 0
+        self._in_flight: Deque[int] = deque()  # ids sent by SetAsync, awaiting drain()
         self.lock = threading.Lock()
         self._connect()
     
     def _connect(self):
         """Connect to the server."""
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Every request is a small line followed by a blocking recv, so
+        # Nagle would only delay it waiting for an ACK that never comes early.
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
         self.socket.connect((self.host, self.port))
+        # Buffered file objects keep line scanning and write coalescing in C
+        self.rfile = self.socket.makefile('rb', buffering=65536)
+        self.wfile = self.socket.makefile('wb', buffering=65536)
+    
+    def _read_response(self) -> Dict[str, Any]:
+        """Read one newline-terminated response. Caller must hold self.lock."""
+        line = self.rfile.readline()
+        if not line.endswith(b'\n'):
+            raise ConnectionError("Connection closed")
+        return _loads(line)
     
     def _send_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Send a request and get response."""
+        return self._send_frame(_dumps(request) + b'\n')
+    
+    def _send_frame(self, message: bytes) -> Dict[str, Any]:
+        """Send one already-encoded request line and get response."""
         with self.lock:
+            if self._in_flight:
+                raise RuntimeError("drain() pending SetAsync replies before a blocking request")
+            
             # Send request
-            message = json.dumps(request).encode('utf-8') + b'\n'
-            self.socket.sendall(message)
+            self.wfile.write(message)
+            self.wfile.flush()
             
             # Receive response
-            while b'\n' not in self.buffer:
-                chunk = self.socket.recv(4096)
-                if not chunk:
-                    raise ConnectionError("Connection closed")
-                self.buffer += chunk
-            
-            line, self.buffer = self.buffer.split(b'\n', 1)
-            return json.loads(line.decode('utf-8'))
+            return self._read_response()
     
     def Set(self, key: str, value: str) -> bool:
         """Set a key-value pair."""
-        request = {'command': 'set', 'key': key, 'value': value}
-        response = self._send_request(request)
+        if _plain(key) and _plain(value):
+            response = self._send_frame(b''.join((_SET_PREFIX, key.encode('utf-8'), _SET_MID,
+                                                  value.encode('utf-8'), _FRAME_END)))
+        else:
+            request = {'command': 'set', 'key': key, 'value': value}
+            response = self._send_request(request)
         return response.get('success', False)
     
+    def SetAsync(self, key: str, value: str):
+        """Send a Set without waiting for its reply; collect replies with drain()."""
+        with self.lock:
+            self._next_id += 1
+            request = {'command': 'set', 'key': key, 'value': value, 'id': self._next_id}
+            # Left in wfile's buffer; drain() flushes the whole window at once
+            self.wfile.write(_dumps(request) + b'\n')
+            self._in_flight.append(self._next_id)
+    
+    def drain(self, n: Optional[int] = None) -> int:
+        """Read replies for the oldest `n` (default: all) SetAsync calls; returns how many succeeded."""
+        with self.lock:
+            self.wfile.flush()
+            if n is None:
+                n = len(self._in_flight)
+            elif not 0 <= n <= len(self._in_flight):
+                raise ValueError(f"drain({n}) with {len(self._in_flight)} SetAsync replies pending")
+            succeeded = 0
+            for _ in range(n):
+                expected = self._in_flight.popleft()
+                response = self._read_response()
+                if response.get('id') != expected:
+                    raise ConnectionError(f"Reply for request {response.get('id')}, expected {expected}")
+                if response.get('success'):
+                    succeeded += 1
+            return succeeded
+    
+    def pipeline(self) -> 'Pipeline':
+        """Queue Set/Get/Delete calls and send them in one write; see Pipeline."""
+        return Pipeline(self)
+    
     def Get(self, key: str) -> Optional[str]:
         """Get value for a key."""
-        request = {'command': 'get', 'key': key}
-        response = self._send_request(request)
+        if _plain(key):
+            response = self._send_frame(b''.join((_GET_PREFIX, key.encode('utf-8'), _FRAME_END)))
+        else:
+            request = {'command': 'get', 'key': key}
+            response = self._send_request(request)
         return response.get('value')
     
     def Delete(self, key: str) -> bool:
@@ -63,9 +137,29 @@ class KVClient:
         response = self._send_request(request)
         return response.get('success', False)
     
+    def BulkSetRange(self, prefix: str, count: int, value: str) -> bool:
+        """Atomically set keys prefix0 .. prefix<count-1> to value; the server builds the batch."""
+        request = {'command': 'bulk_set_range', 'prefix': prefix, 'count': count, 'value': value}
+        response = self._send_request(request)
+        return response.get('success', False)
+    
+    def PipelineSet(self, items: List[Tuple[str, str]], flush_every: int = 256) -> bool:
+        """Set many key-value pairs, flushing every `flush_every` items as one bulk_set.
+
+        Each flushed group costs a single round-trip and a single WAL fsync on
+        the server. Groups are atomic individually, not across the whole call.
+        """
+        success = True
+        for i in range(0, len(items), flush_every):
+            if not self.BulkSet(items[i:i + flush_every]):
+                success = False
+        return success
+    
     def close(self):
         """Close the connection."""
         if self.socket:
+            self.rfile.close()
+            self.wfile.close()
             self.socket.close()
     def FullTextSearch(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
         """Full-text search with TF-IDF ranking"""
@@ -89,4 +183,90 @@ class KVClient:
         """Manually trigger index save"""
         request = {'command': 'save_indexes'}
         response = self._send_request(request)
-        return response.get('success', False)
\ No newline at end of file
+        return response.get('success', False)
+
+class Pipeline:
+    """
+    Requests queued on one KVClient and sent together when the block exits:
+
+        with client.pipeline() as p:
+            p.Set('a', '1')
+            p.Get('a')
+        p.results  # [True, '1']
+
+    The whole batch costs one write and one round-trip; replies are matched
+    to requests by id and results are in call order.
+    """
+    
+    def __init__(self, client: KVClient):
+        self.client = client
+        self.frames: List[bytes] = []
+        self.extractors: List[Tuple[str, Any]] = []  # (reply field, default) per request
+        self.results: List[Any] = []
+    
+    def _queue(self, request: Dict[str, Any], field: str, default: Any):
+        request['id'] = len(self.frames) + 1
+        self.frames.append(_dumps(request) + b'\n')
+        self.extractors.append((field, default))
+    
+    def Set(self, key: str, value: str):
+        self._queue({'command': 'set', 'key': key, 'value': value}, 'success', False)
+    
+    def Get(self, key: str):
+        self._queue({'command': 'get', 'key': key}, 'value', None)
+    
+    def Delete(self, key: str):
+        self._queue({'command': 'delete', 'key': key}, 'success', False)
+    
+    def execute(self) -> List[Any]:
+        """Send every queued request, read the replies, and return the results."""
+        client = self.client
+        with client.lock:
+            if client._in_flight:
+                raise RuntimeError("drain() pending SetAsync replies before a pipeline")
+            client.wfile.write(b''.join(self.frames))
+            client.wfile.flush()
+            results = []
+            for expected, (field, default) in enumerate(self.extractors, 1):
+                response = client._read_response()
+                if response.get('id') != expected:
+                    raise ConnectionError(f"Reply for request {response.get('id')}, expected {expected}")
+                results.append(response.get(field, default))
+        self.frames, self.extractors = [], []
+        self.results = results
+        return results
+    
+    def __enter__(self) -> 'Pipeline':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.execute()
+
+
+class KVClientPool:
+    """Hands each thread its own KVClient, so threads never queue on one socket's lock."""
+    
+    def __init__(self, host: str = 'localhost', port: int = 8000):
+        self.host = host
+        self.port = port
+        self._local = threading.local()
+        self._clients: List[KVClient] = []
+        self._clients_lock = threading.Lock()
+    
+    def get(self) -> KVClient:
+        """Return the calling thread's client, connecting it on first use."""
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = KVClient(self.host, self.port)
+            self._local.client = client
+            with self._clients_lock:
+                self._clients.append(client)
+        return client
+    
+    def close(self):
+        """Close every client handed out by this pool."""
+        with self._clients_lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            client.close()
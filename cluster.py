@@ -1,12 +1,78 @@
 import socket
 import threading
 import time
-import json
 import random
 import sys
+import os
+import selectors
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from server import KVStore
-from typing import  List, Tuple
+from typing import  List, Tuple, Dict, BinaryIO, Deque
 from indexing_module import IndexManager
+from codec import dumps as _dumps, loads as _loads
+
+# Kernel socket buffers sized so replication bursts don't stall in sendall
+SOCKET_BUFFER_SIZE = 1 << 20
+
+# Most entries a follower's replication thread packs into one replicate RPC
+MAX_APPEND_BATCH = 64
+
+# Selector loops sharing the listening socket; reading is cheap next to
+# dispatch on handler_pool, and more loops only contend for the GIL
+MAX_SERVER_LOOPS = 4
+
+
+def _send_line(sock, payload: bytes):
+    """Send payload + newline as one vectored write, without concatenating them."""
+    if not hasattr(sock, 'sendmsg'):  # Windows
+        sock.sendall(payload + b'\n')
+        return
+    sent = sock.sendmsg([payload, b'\n'])
+    if sent <= len(payload):
+        sock.sendall(memoryview(payload)[sent:])
+        sock.sendall(b'\n')
+
+
+class _Connection:
+    """Read-side state of one accepted socket, owned by the selector loop that accepted it."""
+    
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = bytearray()
+        self.scan_pos = 0  # Bytes of self.buffer already known to hold no newline
+        self.recv_buf = bytearray(65536)
+        self.recv_view = memoryview(self.recv_buf)
+        self.lock = threading.Lock()  # Guards pending/busy/closed between loop and worker
+        self.pending: Deque[bytes] = deque()
+        self.busy = False  # A pool worker is answering this connection's messages
+        self.closed = False
+
+
+class _PendingEntry:
+    """A replicated write waiting for a quorum of follower acks."""
+    
+    def __init__(self, entry, quorum: int, voters: int):
+        self.entry = entry
+        self.quorum = quorum
+        self.voters = voters
+        self.acks = 1  # The leader has already applied it
+        self.failures = 0
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        if self.acks >= quorum:
+            self.done.set()
+    
+    def record(self, ok: bool):
+        with self.lock:
+            if ok:
+                self.acks += 1
+            else:
+                self.failures += 1
+            # Done once quorum is reached, or can no longer be reached
+            if self.acks >= self.quorum or self.voters - self.failures < self.quorum:
+                self.done.set()
+
 
 # States
 FOLLOWER = 0
@@ -34,50 +100,143 @@ class ClusterNode:
         self.running = True
         self.lock = threading.Lock()
         
+        # Persistent RPC connections, one per peer, each guarded by its own lock
+        self.peer_sockets: Dict[int, socket.socket] = {}
+        self.peer_readers: Dict[int, BinaryIO] = {}  # Buffered reply readers over peer_sockets
+        self.peer_locks = {i: threading.Lock() for i in range(len(peers))}
+        
+        # Per-follower outboxes; each follower's replication thread ships its
+        # queued entries in one replicate RPC per round-trip
+        self.peer_queues: Dict[int, Deque[_PendingEntry]] = {
+            i: deque() for i in range(len(peers)) if i != node_id}
+        self.peer_queue_conds = {i: threading.Condition() for i in self.peer_queues}
+        
+        # Selector loops only read sockets; messages are dispatched on this pool
+        self.handler_pool = ThreadPoolExecutor(max_workers=64)
+        
+        # One listening socket, bound here so a second process on this port
+        # fails loudly instead of silently sharing its connections
+        self.listen_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listen_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # Set before bind/listen so accepted sockets inherit the sizes
+        self.listen_sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        self.listen_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+        self.listen_sock.bind((self.host, self.port))
+        self.listen_sock.listen()
+        self.listen_sock.setblocking(False)
+        
         # Start Threads
-        threading.Thread(target=self._server_loop, daemon=True).start()
+        # A few selector loops share the socket; whichever wakes first accepts
+        num_loops = min(MAX_SERVER_LOOPS, os.cpu_count() or 1)
+        self._loops_running = num_loops
+        self._loops_lock = threading.Lock()
+        # One wake pipe per loop: stop() closes the write ends, and the EOF
+        # wakes each blocked select at once instead of on a polling timeout
+        self._wake_fds: List[int] = []
+        for _ in range(num_loops):
+            wake_r, wake_w = os.pipe()
+            self._wake_fds.append(wake_w)
+            threading.Thread(target=self._server_loop, args=(wake_r,), daemon=True).start()
         threading.Thread(target=self._election_loop, daemon=True).start()
+        for i in self.peer_queues:
+            threading.Thread(target=self._replication_loop, args=(i,), daemon=True).start()
         print(f"[Node {node_id}] Started on port {self.port}")
 
-    def _server_loop(self):
-        """Handle incoming TCP requests (Client or Peer)."""
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.settimeout(1.0)  # Add timeout to allow graceful shutdown
-        sock.bind((self.host, self.port))
-        sock.listen()
+    def _server_loop(self, wake_fd: int):
+        """Event loop: accept connections and read requests on the shared listening socket, until wake_fd becomes readable."""
+        sock = self.listen_sock
+        selector = selectors.DefaultSelector()
+        selector.register(sock, selectors.EVENT_READ)
+        selector.register(wake_fd, selectors.EVENT_READ)
+        try:
+            while self.running:
+                for key, _ in selector.select():
+                    if key.data is not None:
+                        self._read_connection(key.data, selector)
+                    elif key.fileobj is sock:
+                        self._accept(sock, selector)
+                    else:
+                        return  # stop() closed the wake pipe
+        finally:
+            for key in list(selector.get_map().values()):
+                if key.data is not None:
+                    self._close_connection(key.data, selector)
+            selector.close()
+            os.close(wake_fd)
+            # The last loop out closes the listening socket
+            with self._loops_lock:
+                self._loops_running -= 1
+                if self._loops_running == 0:
+                    sock.close()
+
+    def _accept(self, sock, selector):
+        try:
+            client, _ = sock.accept()
+        except (BlockingIOError, InterruptedError):
+            return  # Another loop sharing the socket took it
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Timeout mode keeps the fd non-blocking for the selector while still
+        # letting a pool worker's sendall wait out a full send buffer
+        client.settimeout(10.0)
+        selector.register(client, selectors.EVENT_READ, _Connection(client))
+
+    def _read_connection(self, conn, selector):
+        """Pull whatever arrived on a readable connection and queue its complete lines."""
+        try:
+            n = conn.sock.recv_into(conn.recv_buf)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            n = 0
+        if not n:
+            self._close_connection(conn, selector)
+            return
         
-        while self.running:
-            try:
-                client, _ = sock.accept()
-                threading.Thread(target=self._handle_request, args=(client,), daemon=True).start()
-            except socket.timeout:
-                continue
-            except:
-                break
+        conn.buffer += conn.recv_view[:n]
+        idx = conn.buffer.find(b'\n', conn.scan_pos)
+        if idx == -1:
+            conn.scan_pos = len(conn.buffer)
+            return
+        # Split off every complete line at once; the remainder waits for more data
+        last = conn.buffer.rfind(b'\n') + 1
+        lines = bytes(conn.buffer[:last]).split(b'\n')
+        del conn.buffer[:last]
+        conn.scan_pos = 0
         
-        sock.close()
+        with conn.lock:
+            conn.pending.extend(line for line in lines if line.strip())
+            if conn.busy or not conn.pending:
+                return
+            conn.busy = True
+        self.handler_pool.submit(self._handle_request, conn)
 
-    def _handle_request(self, sock):
-        """Process JSON messages."""
-        try:
-            data = b""
-            while True:
-                chunk = sock.recv(4096)
-                if not chunk: break
-                data += chunk
-                if b'\n' in data: break
-            
-            msg = json.loads(data.decode())
-            resp = self._dispatch(msg)
-            sock.sendall(json.dumps(resp).encode() + b'\n')
-        except Exception as e:
+    def _handle_request(self, conn):
+        """Answer a connection's queued messages in order; one worker per connection at a time."""
+        while True:
+            with conn.lock:
+                if not conn.pending:
+                    conn.busy = False
+                    if conn.closed:
+                        conn.sock.close()
+                    return
+                line = conn.pending.popleft()
             try:
-                sock.sendall(json.dumps({'error': str(e)}).encode() + b'\n')
-            except:
-                pass
-        finally:
-            sock.close()
+                resp = self._dispatch(_loads(line))
+            except Exception as e:
+                resp = {'error': str(e)}
+            try:
+                conn.sock.sendall(_dumps(resp) + b'\n')
+            except OSError:
+                with conn.lock:
+                    conn.pending.clear()  # Peer disconnected
+
+    def _close_connection(self, conn, selector):
+        selector.unregister(conn.sock)
+        with conn.lock:
+            conn.closed = True
+            if conn.busy:
+                return  # The worker closes it once its current message is answered
+        conn.sock.close()
 
     def _dispatch(self, msg):
         """Route message based on type."""
@@ -141,22 +300,39 @@ class ClusterNode:
             # ADDED: Support for delete operation
             self.store.delete(entry['key'])
             
-        # 2. Send to Peers
-        ack_count = 1 # Self is 1
-        for i, peer in enumerate(self.peers):
-            if i == self.node_id: continue
+        # 2. Queue for every follower; their replication threads send concurrently,
+        # so latency is the slowest needed ack rather than the sum of round-trips
+        pending = _PendingEntry(entry, quorum=len(self.peers) // 2 + 1, voters=len(self.peers))
+        for i, queue in self.peer_queues.items():
+            with self.peer_queue_conds[i]:
+                queue.append(pending)
+                self.peer_queue_conds[i].notify()
+        
+        # 3. Check Quorum (Majority) - returns as soon as it is reached or impossible
+        pending.done.wait(timeout=5.0)
+        return pending.acks >= pending.quorum
+
+    def _replication_loop(self, target_id):
+        """Ship queued entries to one follower, batching whatever piled up during the last RPC."""
+        queue = self.peer_queues[target_id]
+        cond = self.peer_queue_conds[target_id]
+        while self.running:
+            with cond:
+                if not queue:
+                    cond.wait(timeout=1.0)
+                    continue
+                batch = [queue.popleft() for _ in range(min(len(queue), MAX_APPEND_BATCH))]
             
+            # (in real Raft, we send Log Index + Term)
+            msg = {'type': 'replicate', 'entries': [p.entry for p in batch],
+                   'term': self.current_term, 'leader_id': self.node_id}
             try:
-                # Simple implementation: Send entry directly
-                # In real Raft, we send Log Index + Term
-                resp = self._send_rpc(i, {'type': 'replicate', 'entry': entry, 'term': self.current_term})
-                if resp and resp.get('success'):
-                    ack_count += 1
+                resp = self._send_rpc(target_id, msg)
+                ok = bool(resp and resp.get('success'))
             except:
-                pass # Peer might be down
-        
-        # 3. Check Quorum (Majority)
-        return ack_count >= 2 # 2 out of 3 is majority
+                ok = False # Peer might be down
+            for p in batch:
+                p.record(ok)
 
     def _handle_replication(self, msg):
         """Follower receives data from Leader."""
@@ -168,8 +344,9 @@ class ClusterNode:
         self.state = FOLLOWER
         self.leader_id = msg.get('leader_id') # Usually passed in append_entries
         
-        # Write to disk
-        self.store.apply_replication_log(msg['entry'])
+        # Write to disk; a batch costs one fsync however many entries it carries
+        entries = msg['entries'] if 'entries' in msg else [msg['entry']]
+        self.store.apply_replication_batch(entries)
         return {'success': True}
 
     # --- ELECTION LOGIC ---
@@ -189,6 +366,7 @@ class ClusterNode:
         votes = 1
         
         self.last_heartbeat = time.time() # Reset to avoid spam
+        self.election_timeout = random.uniform(1.5, 3.0) # Re-randomize so split votes don't repeat
         
         for i in range(len(self.peers)):
             if i == self.node_id: continue
@@ -232,22 +410,63 @@ class ClusterNode:
             return {'success': True}
         return {'success': False}
 
-    def _send_rpc(self, target_id, msg):
+    def _connect_peer(self, target_id):
         host, port = self.peers[target_id]
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
         s.settimeout(0.2)
         try:
             s.connect((host, port))
-            s.sendall(json.dumps(msg).encode() + b'\n')
-            data = s.recv(1024)
-            return json.loads(data.decode())
-        finally:
+        except OSError:
+            s.close()
+            raise
+        return s
+
+    def _send_rpc(self, target_id, msg):
+        """Send one RPC over the cached peer connection, reconnecting if it went stale."""
+        payload = _dumps(msg)
+        with self.peer_locks[target_id]:
+            while True:
+                s = self.peer_sockets.get(target_id)
+                fresh = s is None
+                if fresh:
+                    s = self._connect_peer(target_id)
+                    self.peer_sockets[target_id] = s
+                    self.peer_readers[target_id] = s.makefile('rb', buffering=65536)
+                try:
+                    _send_line(s, payload)
+                    data = self.peer_readers[target_id].readline()
+                    if not data.endswith(b'\n'):
+                        raise ConnectionError("Peer closed connection")
+                    return _loads(data)
+                except socket.timeout:
+                    # A late reply would desync the stream, so never reuse it
+                    self._drop_peer(target_id)
+                    raise
+                except OSError:
+                    self._drop_peer(target_id)
+                    if fresh:
+                        raise
+                    # Cached socket was stale (peer restarted) - retry once on a new one
+
+    def _drop_peer(self, target_id):
+        reader = self.peer_readers.pop(target_id, None)
+        if reader:
+            reader.close()
+        s = self.peer_sockets.pop(target_id, None)
+        if s:
             s.close()
 
     def stop(self):
         """ADDED: Gracefully shut down the node."""
         print(f"[Node {self.node_id}] Stopping...")
         self.running = False
+        for wake_fd in self._wake_fds:
+            os.close(wake_fd)
+        self._wake_fds = []
+        self.handler_pool.shutdown(wait=False)
         self.store.save_indexes()
         self.store.close()
 
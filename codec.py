@@ -0,0 +1,21 @@
+"""
+codec.py
+JSON encode/decode shared by the server, client, cluster nodes and tests.
+Every message on the wire is one JSON object per line; dumps returns bytes.
+"""
+
+import json
+
+# orjson (optional) encodes straight to bytes and parses several times faster;
+# fall back to the stdlib codec when it isn't installed
+try:
+    import orjson
+    dumps = orjson.dumps
+    loads = orjson.loads
+except ImportError:
+    # Compact separators: smaller frames and a reusable C encoder instance
+    _encoder = json.JSONEncoder(separators=(',', ':'))
+    loads = json.loads
+
+    def dumps(obj) -> bytes:
+        return _encoder.encode(obj).encode('utf-8')
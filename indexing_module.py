@@ -4,11 +4,59 @@ Inverted Index + Phrase Search + Semantic Search (Word Embeddings)
 """
 
 import re
-import hashlib
+import heapq
 import math
+import operator
 import threading
-from typing import Dict, List, Set, Tuple
-from collections import defaultdict
+from array import array
+from bisect import bisect_right
+from itertools import islice, repeat
+from typing import Dict, List, Optional, Set, Tuple
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+
+class RWLock:
+    """
+    Reader/writer lock: any number of readers share it, a writer holds it
+    alone. Waiting writers block new readers so a steady stream of searches
+    can't starve index updates.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
 
 
 class IndexManager:
@@ -23,8 +71,15 @@ class IndexManager:
         # Inverted index: word -> {key: term_frequency}
         self.inverted: Dict[str, Dict[str, int]] = defaultdict(dict)
 
-        # Forward index: key -> [words] (needed for delete + TF-IDF)
-        self.forward: Dict[str, List[str]] = {}
+        # Forward index: key -> token ids (needed for delete + TF-IDF). Ids
+        # index vocab_list, so each distinct word is stored once and a
+        # document costs 4 bytes per token instead of a list of str refs.
+        self.forward: Dict[str, array] = {}
+        self.vocab: Dict[str, int] = {}
+        self.vocab_list: List[str] = []
+
+        # Document length in tokens (TF denominator), kept beside forward
+        self.doc_len: Dict[str, int] = {}
 
         # Document count (for IDF)
         self.doc_count = 0
@@ -32,81 +87,222 @@ class IndexManager:
         # Phrase index: key -> original full text (for phrase matching)
         self.phrases: Dict[str, str] = {}
 
-        # Embedding index: key -> vector
-        self.embeddings: Dict[str, List[float]] = {}
-
-        self.lock = threading.Lock()
+        # The same texts laid end to end in one string, PHRASE_SEP-terminated,
+        # so phrase_search is a few str.find calls instead of a loop over
+        # documents. Slot i starts at _phrase_starts[i] and belongs to
+        # _phrase_keys[i]; removed/overwritten slots become None until the
+        # buffer is rebuilt. Appends collect in _phrase_pending until a search.
+        self._phrase_buf = ''
+        self._phrase_pending: List[str] = []
+        self._phrase_starts: List[int] = []
+        self._phrase_keys: List[Optional[str]] = []
+        self._phrase_slot: Dict[str, int] = {}
+        self._phrase_size = 0  # len(_phrase_buf) + pending
+        self._phrase_dead = 0  # Chars held by None slots
+
+        # Embedding index, stored column-major: one float32 array per dimension,
+        # where row i of every column is the vector of emb_keys[i]. Single
+        # precision halves the memory and is ample for 4-decimal scores.
+        self.emb_columns: List[array] = [array('f') for _ in range(self.EMBED_DIM)]
+        self.emb_keys: List[str] = []
+        self.emb_pos: Dict[str, int] = {}  # key -> row
+
+        # One lock per index, so e.g. a phrase scan doesn't stall full-text or
+        # semantic searches; searches share them, index updates are exclusive.
+        # Writers also take write_lock, which keeps updates to the three
+        # indexes from interleaving; per-index locks never nest.
+        self.write_lock = threading.Lock()
+        self.text_lock = RWLock()      # inverted, forward, vocab, doc_len, doc_count
+        self.phrase_lock = RWLock()    # phrases
+        self.embedding_lock = RWLock() # emb_columns, emb_keys, emb_pos
+
+        # to_dict() keeps its last output and patches only what writers touched
+        # since then (guarded by write_lock). Cached postings dicts are replaced,
+        # never mutated, so earlier to_dict() results stay valid.
+        self._snapshot: Optional[dict] = None
+        self._dirty_words: Set[str] = set()
+        self._dirty_keys: Set[str] = set()
+
+        # Keys changed since the last take_delta(), for incremental saves, in
+        # order of their latest change so a replay re-adds them in that order
+        # (guarded by write_lock)
+        self._delta_keys: Dict[str, None] = {}
 
     # =====================================================================
     # TOKENIZATION
     # =====================================================================
+    _TOKEN_RE = re.compile(r'\w+')
+    # ASCII fast path: every non-word character becomes a space, so
+    # str.split() yields the same tokens as the regex
+    _ASCII_SEPARATORS = str.maketrans({
+        chr(c): ' ' for c in range(128) if not (chr(c).isalnum() or chr(c) == '_')})
+
     def _tokenize(self, text: str) -> List[str]:
         """Lowercase + split on non-alphanumeric."""
-        return re.findall(r'\b\w+\b', text.lower())
+        text = text.lower()
+        if text.isascii():
+            return text.translate(self._ASCII_SEPARATORS).split()
+        return self._TOKEN_RE.findall(text)
 
     # =====================================================================
     # ADD / REMOVE
     # =====================================================================
     def index_value(self, key: str, value: str):
         """Index a key-value pair into all indexes."""
-        with self.lock:
-            # If key already exists, remove old version first
-            if key in self.forward:
-                self._remove_internal(key)
+        self.index_values([(key, value)])
 
+    def index_values(self, items: List[Tuple[str, str]]):
+        """Index several key-value pairs, in order, taking each index lock once."""
+        # Tokens, text and vector depend only on the value - build them unlocked
+        prepared = []
+        for key, value in items:
             words = self._tokenize(value)
-            self.forward[key] = words
-            self.doc_count += 1
+            prepared.append((key, words, Counter(words), value.lower(), self._embed(value)))
 
+        with self.write_lock:
             # --- Inverted index (word -> {key: count}) ---
-            for word in words:
-                if key not in self.inverted[word]:
-                    self.inverted[word][key] = 0
-                self.inverted[word][key] += 1
+            with self.text_lock.write():
+                for key, words, term_counts, _, _ in prepared:
+                    # If key already exists, remove old version first
+                    self._remove_text(key)
+                    self.forward[key] = self._token_ids(words, term_counts)
+                    self.doc_len[key] = len(words)
+                    self.doc_count += 1
+                    for word, count in term_counts.items():
+                        self.inverted[word][key] = count
+            for key, _, term_counts, _, _ in prepared:
+                self._dirty_words.update(term_counts)
+                self._dirty_keys.add(key)
+                self._delta_keys.pop(key, None)
+                self._delta_keys[key] = None
 
             # --- Phrase index (store original text) ---
-            self.phrases[key] = value.lower()
+            with self.phrase_lock.write():
+                for key, _, _, lowered, _ in prepared:
+                    self._add_phrase(key, lowered)
 
             # --- Embedding index ---
-            self.embeddings[key] = self._embed(value)
+            with self.embedding_lock.write():
+                for key, _, _, _, vector in prepared:
+                    self._set_embedding(key, vector)
 
     def remove_value(self, key: str):
         """Remove a key from all indexes."""
-        with self.lock:
-            self._remove_internal(key)
-
-    def _remove_internal(self, key: str):
-        """Internal remove — caller must hold self.lock."""
+        with self.write_lock:
+            with self.text_lock.write():
+                if not self._remove_text(key):
+                    return
+            self._dirty_keys.add(key)
+            self._delta_keys.pop(key, None)
+            self._delta_keys[key] = None
+
+            # Remove from phrase index
+            with self.phrase_lock.write():
+                self._drop_phrase(key)
+
+            # Remove from embeddings
+            with self.embedding_lock.write():
+                self._remove_embedding(key)
+
+    def _remove_text(self, key: str) -> bool:
+        """Drop key from the forward + inverted index — caller must hold write_lock and text_lock."""
         if key not in self.forward:
-            return
+            return False
 
-        words = self.forward.pop(key)
+        words = set(map(self.vocab_list.__getitem__, self.forward.pop(key)))
+        del self.doc_len[key]
         self.doc_count = max(0, self.doc_count - 1)
+        self._dirty_words.update(words)
 
-        # Remove from inverted index
+        # Remove from inverted index (each distinct word once)
         for word in words:
-            if word in self.inverted and key in self.inverted[word]:
-                del self.inverted[word][key]
-                if not self.inverted[word]:
+            postings = self.inverted.get(word)
+            if postings is not None and key in postings:
+                del postings[key]
+                if not postings:
                     del self.inverted[word]
-
-        # Remove from phrase index
-        self.phrases.pop(key, None)
-
-        # Remove from embeddings
-        self.embeddings.pop(key, None)
+        return True
+
+    def _token_ids(self, words: List[str], distinct=None) -> array:
+        """Map words to vocab ids, adding unseen words — caller must hold self.text_lock."""
+        vocab = self.vocab
+        for word in (distinct if distinct is not None else set(words)):
+            if word not in vocab:
+                vocab[word] = len(self.vocab_list)
+                self.vocab_list.append(word)
+        return array('i', map(vocab.__getitem__, words))
+
+    def _words(self, key: str) -> List[str]:
+        """key's tokens as words — caller must hold self.text_lock."""
+        return list(map(self.vocab_list.__getitem__, self.forward[key]))
+
+    def _add_phrase(self, key: str, text: str):
+        """Store key's lowercased text — caller must hold self.phrase_lock."""
+        self._drop_phrase(key)
+        self.phrases[key] = text
+        self._phrase_slot[key] = len(self._phrase_keys)
+        self._phrase_keys.append(key)
+        self._phrase_starts.append(self._phrase_size)
+        self._phrase_pending.append(text + self.PHRASE_SEP)
+        self._phrase_size += len(text) + 1
+
+    def _drop_phrase(self, key: str):
+        """Remove key's text, leaving a dead slot — caller must hold self.phrase_lock."""
+        text = self.phrases.pop(key, None)
+        if text is None:
+            return
+        self._phrase_keys[self._phrase_slot.pop(key)] = None
+        self._phrase_dead += len(text) + 1
+        # Compact once dead slots make up most of the buffer
+        if self._phrase_dead * 2 > self._phrase_size:
+            self._rebuild_phrase_buffer()
+
+    def _rebuild_phrase_buffer(self):
+        """Re-lay the buffer from self.phrases — caller must hold self.phrase_lock."""
+        parts, starts, size = [], [], 0
+        for text in self.phrases.values():
+            starts.append(size)
+            parts.append(text + self.PHRASE_SEP)
+            size += len(text) + 1
+        self._phrase_buf = ''.join(parts)
+        self._phrase_pending = []
+        self._phrase_starts = starts
+        self._phrase_keys = list(self.phrases)
+        self._phrase_slot = {key: slot for slot, key in enumerate(self._phrase_keys)}
+        self._phrase_size = size
+        self._phrase_dead = 0
+
+    def _set_embedding(self, key: str, vector: List[float]):
+        """Store key's vector as a row of the column arrays — caller must hold self.embedding_lock."""
+        row = self.emb_pos.get(key)
+        if row is None:
+            self.emb_pos[key] = len(self.emb_keys)
+            self.emb_keys.append(key)
+            for column, x in zip(self.emb_columns, vector):
+                column.append(x)
+        else:
+            for column, x in zip(self.emb_columns, vector):
+                column[row] = x
+
+    def _remove_embedding(self, key: str):
+        """Drop key's row by moving the last row into its place — caller must hold self.embedding_lock."""
+        row = self.emb_pos.pop(key, None)
+        if row is None:
+            return
+        last = len(self.emb_keys) - 1
+        if row != last:
+            moved = self.emb_keys[last]
+            self.emb_keys[row] = moved
+            self.emb_pos[moved] = row
+            for column in self.emb_columns:
+                column[row] = column[last]
+        self.emb_keys.pop()
+        for column in self.emb_columns:
+            column.pop()
 
     # =====================================================================
     # FULL-TEXT SEARCH (TF-IDF ranked)
     # =====================================================================
-    def _tf(self, word: str, key: str) -> float:
-        """Term Frequency: how often word appears in document."""
-        words = self.forward.get(key, [])
-        if not words:
-            return 0.0
-        count = self.inverted.get(word, {}).get(key, 0)
-        return count / len(words)
-
     def _idf(self, word: str) -> float:
         """Inverse Document Frequency: how rare the word is."""
         df = len(self.inverted.get(word, {}))
@@ -123,44 +319,98 @@ class IndexManager:
         if not query_words:
             return []
 
-        with self.lock:
-            # Collect candidate keys (any document containing any query word)
-            candidates: Set[str] = set()
-            for word in query_words:
-                candidates.update(self.inverted.get(word, {}).keys())
-
-            # Score each candidate
-            scores: Dict[str, float] = {}
-            for key in candidates:
-                score = 0.0
-                for word in query_words:
-                    score += self._tf(word, key) * self._idf(word)
-                scores[key] = score
-
-        # Sort by score descending, return top_k
-        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-        return ranked[:top_k]
+        distinct = Counter(query_words)
+        with self.text_lock.read():
+            doc_len = self.doc_len
+            if len(distinct) == 1:
+                # Single-word query: the postings are the candidates and each
+                # score is one product, so rank them without an accumulator
+                (word, occurrences), = distinct.items()
+                postings = self.inverted.get(word)
+                if not postings:
+                    return []
+                weight = self._idf(word) * occurrences
+                return heapq.nlargest(top_k, ((key, count / doc_len[key] * weight)
+                                              for key, count in postings.items()),
+                                      key=operator.itemgetter(1))
+
+            # Term-at-a-time: walk each query word's posting list once and add
+            # its TF-IDF share into an accumulator. Candidates (any document
+            # containing any query word) are exactly the keys that get a score,
+            # and documents missing a word never cost a lookup.
+            scores: Optional[Dict[str, float]] = None
+            # A word repeated in the query counts once per occurrence, so fold
+            # the repeats into its weight and walk its postings only once
+            for word, occurrences in distinct.items():
+                postings = self.inverted.get(word)
+                if not postings:
+                    continue
+                weight = self._idf(word) * occurrences
+                if scores is None:
+                    # The first word's shares seed the accumulator in one
+                    # comprehension, without a get-and-add per posting
+                    scores = {key: count / doc_len[key] * weight for key, count in postings.items()}
+                    continue
+                for key, count in postings.items():
+                    scores[key] = scores.get(key, 0.0) + count / doc_len[key] * weight
+            if scores is None:
+                return []
+
+        # Highest scores first; a bounded heap avoids sorting every candidate
+        return heapq.nlargest(top_k, scores.items(), key=operator.itemgetter(1))
 
     # =====================================================================
     # PHRASE SEARCH (Exact match)
     # =====================================================================
+    PHRASE_SEP = '\x00'  # Terminates each text in the phrase buffer
+
     def phrase_search(self, phrase: str) -> List[str]:
         """
         Exact phrase search.
         Returns: [key, ...] where value contains the exact phrase.
         """
         phrase_lower = phrase.lower()
-        with self.lock:
-            results = []
-            for key, text in self.phrases.items():
-                if phrase_lower in text:
-                    results.append(key)
-            return results
+        if not phrase_lower or self.PHRASE_SEP in phrase_lower:
+            # Would match across/at slot boundaries - check each text instead
+            with self.phrase_lock.read():
+                return [key for key, text in self.phrases.items() if phrase_lower in text]
+
+        while True:
+            with self.phrase_lock.read():
+                if not self._phrase_pending:
+                    return self._scan_phrase_buffer(phrase_lower)
+            # Appending pending texts mutates the buffer - needs the lock alone
+            with self.phrase_lock.write():
+                if self._phrase_pending:
+                    self._phrase_buf += ''.join(self._phrase_pending)
+                    self._phrase_pending = []
+
+    def _scan_phrase_buffer(self, phrase_lower: str) -> List[str]:
+        """Keys whose text contains phrase_lower — caller must hold self.phrase_lock."""
+        buf, starts, keys = self._phrase_buf, self._phrase_starts, self._phrase_keys
+        results = []
+        pos = buf.find(phrase_lower)
+        while pos != -1:
+            slot = bisect_right(starts, pos) - 1
+            if keys[slot] is not None:
+                results.append(keys[slot])
+            # One hit per document is enough; resume at the next slot
+            if slot + 1 == len(starts):
+                break
+            pos = buf.find(phrase_lower, starts[slot + 1])
+        return results
 
     # =====================================================================
     # SEMANTIC SEARCH (Character n-gram Embeddings)
     # =====================================================================
     EMBED_DIM = 128  # Embedding vector size
+    EMBED_VERSION = 2  # Bump when _embed changes; saved vectors are then rebuilt
+
+    # 3-gram hash: polynomial in the three code points, then a multiplicative
+    # (Fibonacci) mix whose high bits pick the bucket
+    _HASH_BASE = 1000003
+    _HASH_MIX = 0x9E3779B1
+    _BUCKET_SHIFT = 33 - EMBED_DIM.bit_length()  # 32 - log2(EMBED_DIM); EMBED_DIM must be a power of two
 
     def _embed(self, text: str) -> List[float]:
         """
@@ -168,63 +418,157 @@ class IndexManager:
         Normalized to unit length for cosine similarity.
         """
         text = text.lower()
+        base, mix, shift = self._HASH_BASE, self._HASH_MIX, self._BUCKET_SHIFT
         vector = [0.0] * self.EMBED_DIM
 
-        # Generate 3-grams
-        for i in range(len(text) - 2):
-            trigram = text[i:i+3]
-            h = int(hashlib.md5(trigram.encode()).hexdigest(), 16)
-            idx = h % self.EMBED_DIM
-            vector[idx] += 1.0
-
-        # Normalize
-        mag = math.sqrt(sum(x * x for x in vector))
-        if mag > 0:
-            vector = [x / mag for x in vector]
+        # Generate 3-grams - only bucket dispersion matters, so a cheap integer
+        # hash over the code points replaces a cryptographic digest per 3-gram.
+        # The top bits of the 32-bit hash pick the bucket; Counter tallies the
+        # buckets in C instead of a Python += per 3-gram.
+        codes = list(map(ord, text))
+        buckets = Counter([(((a * base + b) * base + c) * mix & 0xFFFFFFFF) >> shift
+                           for a, b, c in zip(codes, islice(codes, 1, None), islice(codes, 2, None))])
+
+        # Normalize while filling the only list this allocates. Counts are
+        # integers, so the squared sum is exact whatever order it's taken in.
+        if buckets:
+            mag = math.sqrt(sum(count * count for count in buckets.values()))
+            for bucket, count in buckets.items():
+                vector[bucket] = count / mag
 
         return vector
 
-    def _cosine(self, a: List[float], b: List[float]) -> float:
-        """Cosine similarity (vectors already normalized → just dot product)."""
-        return sum(x * y for x, y in zip(a, b))
+    def _similarities(self, q_vec: List[float]) -> List[float]:
+        """
+        Cosine similarity of q_vec against every row (vectors already normalized
+        → just dot product), computed one column at a time: map() keeps the
+        per-row multiply-add in C, and columns where the query is 0 are skipped.
+        The first such column seeds the sums, saving a pass over a zero list.
+        Caller must hold self.embedding_lock.
+        """
+        sims = None
+        for column, weight in zip(self.emb_columns, q_vec):
+            if weight:
+                products = map(operator.mul, column, repeat(weight))
+                sims = list(products if sims is None else map(operator.add, sims, products))
+        return sims if sims is not None else [0.0] * len(self.emb_keys)
 
     def semantic_search(self, query: str, top_k: int = 10) -> List[Tuple[str, float]]:
         """
         Semantic search using embedding similarity.
         Returns: [(key, similarity_score), ...]
         """
-        q_vec = self._embed(query)
-
-        with self.lock:
-            scores = []
-            for key, doc_vec in self.embeddings.items():
-                sim = self._cosine(q_vec, doc_vec)
-                scores.append((key, round(sim, 4)))
+        return self.batch_semantic_search([query], top_k)[0]
 
-        scores.sort(key=lambda x: x[1], reverse=True)
-        return scores[:top_k]
+    def batch_semantic_search(self, queries: List[str], top_k: int = 10) -> List[List[Tuple[str, float]]]:
+        """
+        Semantic search for several queries under one lock acquisition.
+        Returns: one [(key, similarity_score), ...] list per query.
+        """
+        q_vecs = [self._embed(query) for query in queries]
+
+        results = []
+        with self.embedding_lock.read():
+            keys = self.emb_keys
+            for q_vec in q_vecs:
+                # Rank row numbers straight off the score list rather than
+                # building a (key, score) tuple per document
+                sims = self._similarities(q_vec)
+                top = heapq.nlargest(top_k, range(len(sims)), key=sims.__getitem__)
+                # Round for display only once the top_k are known
+                results.append([(keys[row], round(sims[row], 4)) for row in top])
+        return results
 
     # =====================================================================
     # SERIALIZATION (save/load indexes to JSON)
     # =====================================================================
     def to_dict(self) -> dict:
         """Serialize all indexes to a plain dict for JSON saving."""
-        with self.lock:
+        # Holding write_lock freezes all three indexes; searches only read them
+        with self.write_lock:
+            snap = self._snapshot
+            if snap is None:
+                snap = self._snapshot = {
+                    'inverted': {word: dict(docs) for word, docs in self.inverted.items()},
+                    'forward': {key: self._words(key) for key in self.forward},
+                    'phrases': dict(self.phrases),
+                    'embeddings': {key: [column[row] for column in self.emb_columns]
+                                   for row, key in enumerate(self.emb_keys)},
+                }
+            else:
+                # Only postings/documents changed since the last call are copied
+                for word in self._dirty_words:
+                    postings = self.inverted.get(word)
+                    if postings:
+                        snap['inverted'][word] = dict(postings)
+                    else:
+                        snap['inverted'].pop(word, None)
+                for key in self._dirty_keys:
+                    if key in self.forward:
+                        snap['forward'][key] = self._words(key)
+                        snap['phrases'][key] = self.phrases[key]
+                        row = self.emb_pos[key]
+                        snap['embeddings'][key] = [column[row] for column in self.emb_columns]
+                    else:
+                        snap['forward'].pop(key, None)
+                        snap['phrases'].pop(key, None)
+                        snap['embeddings'].pop(key, None)
+            self._dirty_words.clear()
+            self._dirty_keys.clear()
+
+            # Shallow copies: the caller may serialize while writers carry on
             return {
-                'inverted': {word: dict(docs) for word, docs in self.inverted.items()},
-                'forward': dict(self.forward),
+                'inverted': dict(snap['inverted']),
+                'forward': dict(snap['forward']),
                 'doc_count': self.doc_count,
-                'phrases': dict(self.phrases),
-                'embeddings': {k: v for k, v in self.embeddings.items()},
+                'phrases': dict(snap['phrases']),
+                'embed_version': self.EMBED_VERSION,
+                'embeddings': dict(snap['embeddings']),
             }
 
+    def take_delta(self) -> Dict[str, Optional[str]]:
+        """
+        Keys changed since the last call, mapped to their indexed text (None
+        if removed). Replaying it with apply_delta() on the state from the
+        previous call reproduces the current indexes.
+        """
+        with self.write_lock:
+            delta = {key: self.phrases.get(key) for key in self._delta_keys}
+            self._delta_keys.clear()
+            return delta
+
+    def restore_delta(self, delta: Dict[str, Optional[str]]):
+        """Put back a take_delta() result that failed to save, so the next call includes it."""
+        with self.write_lock:
+            # Keys changed since the take keep their later position
+            newer = self._delta_keys
+            self._delta_keys = dict.fromkeys(key for key in delta if key not in newer)
+            self._delta_keys.update(newer)
+
+    def apply_delta(self, delta: Dict[str, Optional[str]]):
+        """Replay a take_delta() result."""
+        for key, text in delta.items():
+            if text is None:
+                self.remove_value(key)
+            else:
+                # Stored text is lowercased; tokens, phrase and vector come out the same
+                self.index_value(key, text)
+
     @classmethod
     def from_dict(cls, data: dict) -> 'IndexManager':
         """Deserialize indexes from a plain dict."""
         obj = cls()
         obj.inverted = defaultdict(dict, {w: dict(d) for w, d in data.get('inverted', {}).items()})
-        obj.forward = data.get('forward', {})
+        obj.forward = {key: obj._token_ids(words) for key, words in data.get('forward', {}).items()}
+        obj.doc_len = {key: len(ids) for key, ids in obj.forward.items()}
         obj.doc_count = data.get('doc_count', 0)
         obj.phrases = data.get('phrases', {})
-        obj.embeddings = data.get('embeddings', {})
+        obj._rebuild_phrase_buffer()
+        if data.get('embed_version') == cls.EMBED_VERSION:
+            for key, vector in data.get('embeddings', {}).items():
+                obj._set_embedding(key, vector)
+        else:
+            # Saved with an older _embed; the stored text is enough to rebuild
+            for key, text in obj.phrases.items():
+                obj._set_embedding(key, obj._embed(text))
         return obj
\ No newline at end of file
@@ -5,14 +5,56 @@ Masterless (Multi-Master) Replication using Vector Clocks.
 FIX: Changed data_dir initialization to avoid double-nesting directories
 """
 
+import os
+import select
 import socket
-import json
+import operator
+import queue
 import threading
 import time
 import sys
-from typing import List, Tuple, Dict, Optional, Any
+from collections import deque
+from typing import List, Tuple, Dict, Optional, Any, BinaryIO, Deque
 from server import KVStore
 from indexing_module import IndexManager
+from codec import dumps as _dumps, loads as _loads
+
+# Most ops carried by one replicate_batch message
+MAX_REPLICATE_BATCH = 256
+
+# Most connection workers kept waiting for the next connection; busy ones
+# are never capped, since peers and pooled clients hold theirs open
+MAX_IDLE_CONNECTION_WORKERS = 64
+
+# Local writes kept for peers catching up after a restart (sync_since)
+SYNC_LOG_SIZE = 100_000
+
+# Ops are encoded once when queued; batches splice the encoded ops into these
+_REPLICATE_BATCH_PREFIX = b'{"type":"replicate_batch","ops":['
+_SYNC_BATCH_PREFIX = b'{"ops":['
+_BATCH_END = b']}\n'
+
+# Most buffers one sendmsg() takes (IOV_MAX on Linux and macOS)
+_IOV_MAX = 1024
+
+
+def _send_buffers(sock: socket.socket, buffers: List[bytes]):
+    """Send buffers back-to-back as scatter-gather writes, without joining them first."""
+    if not hasattr(sock, 'sendmsg'):  # Windows
+        sock.sendall(b''.join(buffers))
+        return
+    pending = [memoryview(buf) for buf in buffers if buf]
+    i = 0
+    while i < len(pending):
+        sent = sock.sendmsg(pending[i:i + _IOV_MAX])
+        # Skip what went out; a partly sent buffer resumes where it stopped
+        while sent:
+            n = len(pending[i])
+            if sent < n:
+                pending[i] = pending[i][sent:]
+                break
+            sent -= n
+            i += 1
 
 
 class MasterlessNode:
@@ -31,22 +73,44 @@ class MasterlessNode:
         # FIX: Pass the complete path, use empty instance_id to avoid double-nesting
         self.store = KVStore(data_dir=f"masterless_data/node_{node_id}", instance_id="")
 
-        # Vector clock: {node_id_str -> version}
+        # Vector clock: [version per node_id], one slot per peer
         # Tracks how many writes each node has done
-        self.vector_clock: Dict[str, int] = {str(i): 0 for i in range(len(peers))}
+        self.vector_clock: List[int] = [0] * len(peers)
         self.clock_lock = threading.Lock()
 
-        self.applied_versions: Dict[str, int] = {str(i): 0 for i in range(len(peers))}
+        self.applied_versions: List[int] = [0] * len(peers)
+
+        # Replication queue — local writes (encoded replicate messages)
+        # waiting to be sent to peers. deque append/popleft are atomic, so
+        # writers enqueue without a lock
+        self.replication_queue: Deque[bytes] = deque()
 
-        # Replication queue — local writes waiting to be sent to peers
-        self.replication_queue: List[Dict] = []
-        self.queue_lock = threading.Lock()
+        # Most recent local writes as (own clock version, encoded message),
+        # served to restarting peers by sync_since
+        self.sync_log: Deque[Tuple[int, bytes]] = deque(maxlen=SYNC_LOG_SIZE)
 
         # Conflict log — stores any conflicts that were detected and resolved
         self.conflict_log: List[Dict] = []
 
+        # Persistent connections to peers, used only by _replication_loop
+        self.peer_sockets: Dict[int, socket.socket] = {}
+        self.peer_readers: Dict[int, BinaryIO] = {}  # Buffered ack readers over peer_sockets
+
         self.running = True
 
+        # Accepted sockets wait here for a connection worker. A worker is
+        # started whenever none is idle and reused afterwards (up to
+        # MAX_IDLE_CONNECTION_WORKERS of them), so a short client connection
+        # rarely costs a thread start. They're daemon threads: a peer
+        # connection may stay open until the process exits.
+        self.connection_queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.connection_workers = 0
+        self.idle_connection_workers = 0
+        self.connection_workers_lock = threading.Lock()
+
+        # stop() closes the write end; the EOF wakes the accept loop at once
+        self._wake_r, self._wake_w = os.pipe()
+
         # Start TCP server thread
         threading.Thread(target=self._server_loop, daemon=True).start()
 
@@ -59,10 +123,6 @@ class MasterlessNode:
     # =====================================================================
     # VECTOR CLOCK OPERATIONS
     # =====================================================================
-    def _increment_clock(self):
-        """Increment own component of vector clock (called on local write)."""
-        with self.clock_lock:
-            self.vector_clock[str(self.node_id)] += 1
     def _sync_with_peers(self):
         """On startup, pull all latest writes from peers to catch up."""
         for peer_idx, (host, port) in enumerate(self.peers):
@@ -72,44 +132,32 @@ class MasterlessNode:
                 s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 s.settimeout(2.0)
                 s.connect((host, port))
-                s.sendall(json.dumps({'type': 'get_all_entries'}).encode('utf-8') + b'\n')
-                buffer = b''
-                while True:
-                    chunk = s.recv(4096)
-                    if not chunk:
-                        break
-                    buffer += chunk
+                # Ask only for the peer's writes newer than what we've applied;
+                # they arrive as a stream of batches, applied one at a time
+                s.sendall(_dumps({'type': 'sync_since', 'applied_versions': self.applied_versions}) + b'\n')
+                with s.makefile('rb') as reader:
+                    for line in reader:
+                        frame = _loads(line)
+                        if 'ops' not in frame:
+                            break  # End of stream (or an error reply)
+                        self._handle_replicate_batch(frame)
                 s.close()
-                if buffer:
-                    data = json.loads(buffer.decode())
-                    for entry, clock, source in data.get('entries', []):
-                        self._handle_replicate({
-                            'entry': entry,
-                            'vector_clock': clock,
-                            'source_node': source
-                        })
             except:
                 pass
 
-    def _merge_clock(self, other_clock: Dict[str, int]):
-        """Merge incoming clock — take max of each component."""
-        with self.clock_lock:
-            for nid, ver in other_clock.items():
-                current = self.vector_clock.get(nid, 0)
-                self.vector_clock[nid] = max(current, ver)
-
-    def _get_clock(self) -> Dict[str, int]:
+    def _get_clock(self) -> List[int]:
         with self.clock_lock:
-            return dict(self.vector_clock)
+            return list(self.vector_clock)
 
-    def _is_concurrent(self, clock_a: Dict[str, int], clock_b: Dict[str, int]) -> bool:
+    def _is_concurrent(self, clock_a: List[int], clock_b: List[int]) -> bool:
         """
         Two events are CONCURRENT if neither happened-before the other.
         This means: a is not <= b AND b is not <= a.
         Concurrent writes = conflict.
         """
-        a_leq_b = all(clock_a.get(k, 0) <= clock_b.get(k, 0) for k in set(clock_a) | set(clock_b))
-        b_leq_a = all(clock_b.get(k, 0) <= clock_a.get(k, 0) for k in set(clock_a) | set(clock_b))
+        # Clocks are dense and equal-length, so compare slot by slot in C
+        a_leq_b = all(map(operator.le, clock_a, clock_b))
+        b_leq_a = all(map(operator.le, clock_b, clock_a))
         return not a_leq_b and not b_leq_a
 
     # =====================================================================
@@ -118,43 +166,74 @@ class MasterlessNode:
     def _server_loop(self):
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.settimeout(1.0)
         sock.bind((self.host, self.port))
         sock.listen(5)
 
         while self.running:
             try:
+                readable, _, _ = select.select([sock, self._wake_r], [], [])
+                if self._wake_r in readable:
+                    break  # stop() closed the wake pipe
                 client_sock, _ = sock.accept()
-                threading.Thread(target=self._handle_connection, args=(client_sock,), daemon=True).start()
-            except socket.timeout:
-                continue
+                self._submit_connection(client_sock)
             except:
                 break
         sock.close()
+        os.close(self._wake_r)
+
+    def _submit_connection(self, sock: socket.socket):
+        """Hand sock to an idle connection worker, or start one if none is idle."""
+        with self.connection_workers_lock:
+            # Reserve the idle worker here rather than when it wakes, so a
+            # burst never counts the same worker twice; a worker keeps its
+            # connection until the other side closes it, so a socket must
+            # never be left queued behind busy workers
+            start = self.idle_connection_workers == 0
+            if start:
+                self.connection_workers += 1
+            else:
+                self.idle_connection_workers -= 1
+        self.connection_queue.put(sock)
+        if start:
+            threading.Thread(target=self._connection_worker, daemon=True).start()
 
-    def _handle_connection(self, sock: socket.socket):
-        """Read one JSON message, dispatch, send response."""
-        buffer = b""
-        try:
-            while True:
-                chunk = sock.recv(4096)
-                if not chunk:
-                    break
-                buffer += chunk
-                if b'\n' in buffer:
-                    break
-
-            if not buffer.strip():
+    def _connection_worker(self):
+        """Serve queued connections one after another until stop() sends None."""
+        while True:
+            # Already counted busy by _submit_connection (or new for this socket)
+            sock = self.connection_queue.get()
+            if sock is None:
                 return
+            self._handle_connection(sock)
+            with self.connection_workers_lock:
+                if self.idle_connection_workers >= MAX_IDLE_CONNECTION_WORKERS:
+                    self.connection_workers -= 1
+                    return
+                self.idle_connection_workers += 1
 
-            msg = json.loads(buffer.decode().strip())
-            response = self._dispatch(msg)
-            sock.sendall(json.dumps(response).encode('utf-8') + b'\n')
-        except Exception as e:
-            try:
-                sock.sendall(json.dumps({'status': 'error', 'message': str(e)}).encode('utf-8') + b'\n')
-            except:
-                pass
+    def _handle_connection(self, sock: socket.socket):
+        """Read JSON messages one line at a time, dispatch each, send its response.
+
+        Peers and pooled clients keep their connection open and pipeline
+        messages on it, so serve lines until the other side closes.
+        """
+        try:
+            with sock.makefile('rb', buffering=65536) as reader:
+                for line in reader:
+                    if not line.strip():
+                        continue
+                    try:
+                        msg = _loads(line)
+                        if msg.get('type') == 'sync_since':
+                            # Answered with several lines, not one response
+                            self._send_sync(sock, msg)
+                            continue
+                        response = self._dispatch(msg)
+                    except Exception as e:
+                        response = {'status': 'error', 'message': str(e)}
+                    sock.sendall(_dumps(response) + b'\n')
+        except OSError:
+            pass
         finally:
             sock.close()
 
@@ -165,12 +244,16 @@ class MasterlessNode:
         # --- Peer replication message ---
         if msg_type == 'replicate':
             return self._handle_replicate(msg)
+        if msg_type == 'replicate_batch':
+            return self._handle_replicate_batch(msg)
 
         # --- Client messages ---
         if msg_type == 'set':
             return self._handle_set(msg)
         elif msg_type == 'get':
             return self._handle_get(msg)
+        elif msg_type == 'mget':
+            return self._handle_mget(msg)
         elif msg_type == 'delete':
             return self._handle_delete(msg)
         elif msg_type == 'bulk_set':
@@ -198,21 +281,12 @@ class MasterlessNode:
         key = msg.get('key') or msg.get('query')
         value = msg.get('value')
 
-        # 1. Increment own clock
-        self._increment_clock()
+        # 1. Increment own clock and queue for replication to peers
+        self._queue_replication({'type': 'set', 'key': key, 'value': value})
 
         # 2. Apply locally
         self.store.set(key, value)
 
-        # 3. Queue for replication to peers
-        with self.queue_lock:
-            self.replication_queue.append({
-                'type': 'replicate',
-                'entry': {'type': 'set', 'key': key, 'value': value},
-                'vector_clock': self._get_clock(),
-                'source_node': self.node_id
-            })
-
         return {'status': 'ok', 'success': True}
 
     def _handle_get(self, msg: Dict) -> Dict:
@@ -220,19 +294,15 @@ class MasterlessNode:
         value = self.store.get(key)
         return {'status': 'ok', 'value': value}
 
+    def _handle_mget(self, msg: Dict) -> Dict:
+        values = self.store.get_many(msg.get('keys', []))
+        return {'status': 'ok', 'values': values}
+
     def _handle_delete(self, msg: Dict) -> Dict:
         key = msg.get('key')
-        self._increment_clock()
+        self._queue_replication({'type': 'delete', 'key': key})
         success = self.store.delete(key)
 
-        with self.queue_lock:
-            self.replication_queue.append({
-                'type': 'replicate',
-                'entry': {'type': 'delete', 'key': key},
-                'vector_clock': self._get_clock(),
-                'source_node': self.node_id
-            })
-
         return {'status': 'ok', 'success': success}
 
     def _handle_bulk_set(self, msg: Dict) -> Dict:
@@ -245,35 +315,83 @@ class MasterlessNode:
             else:
                 normalized.append((item[0], item[1]))
 
-        self._increment_clock()
+        self._queue_replication({'type': 'bulk_set', 'items': normalized})
         self.store.bulk_set(normalized)
 
-        with self.queue_lock:
-            self.replication_queue.append({
+        return {'status': 'ok', 'success': True}
+
+    def _queue_replication(self, entry: Dict):
+        """
+        Increment own component of the vector clock for a local write, stamp
+        the write with it and queue it for the peers (and sync_since).
+        """
+        # One lock hold for stamp and enqueue keeps the queue in version
+        # order: peers drop any version at or below the last one applied
+        with self.clock_lock:
+            self.vector_clock[self.node_id] += 1
+            clock = self.vector_clock
+            # Encoded here, once, so the replication loop only splices bytes
+            op = _dumps({
                 'type': 'replicate',
-                'entry': {'type': 'bulk_set', 'items': normalized},
-                'vector_clock': self._get_clock(),
+                'entry': entry,
+                'vector_clock': clock,
                 'source_node': self.node_id
             })
+            self.replication_queue.append(op)
+            self.sync_log.append((clock[self.node_id], op))
 
-        return {'status': 'ok', 'success': True}
+    def _send_sync(self, sock: socket.socket, msg: Dict):
+        """
+        Stream our local writes the requesting peer hasn't applied yet, in
+        version order, as {'ops': [...]} lines followed by a done line.
+        """
+        cursor = msg.get('applied_versions', [])
+        since = cursor[self.node_id] if len(cursor) == len(self.peers) else 0
+        ops = [op for version, op in sorted(item for item in list(self.sync_log) if item[0] > since)]
+        for i in range(0, len(ops), MAX_REPLICATE_BATCH):
+            sock.sendall(_SYNC_BATCH_PREFIX + b','.join(ops[i:i + MAX_REPLICATE_BATCH]) + _BATCH_END)
+        sock.sendall(_dumps({'status': 'ok', 'done': True}) + b'\n')
 
     # =====================================================================
     # INCOMING REPLICATION FROM PEER
     # =====================================================================
     def _handle_replicate(self, msg: Dict) -> Dict:
-        incoming_clock = msg.get('vector_clock', {})
+        with self.clock_lock:
+            entry = self._accept_replicate(msg)
+        if entry is not None:
+            self.store.apply_replication_log(entry)
+        return {'success': True}
+
+    def _handle_replicate_batch(self, msg: Dict) -> Dict:
+        """Resolve each op in order, then apply the winners with one WAL sync."""
+        with self.clock_lock:
+            entries = [entry for entry in map(self._accept_replicate, msg.get('ops', []))
+                       if entry is not None]
+        # Catch-up replays are often all duplicates - then skip the store lock entirely
+        if entries:
+            self.store.apply_replication_batch(entries)
+        return {'success': True}
+
+    def _accept_replicate(self, msg: Dict) -> Optional[Dict]:
+        """
+        Run conflict detection for one replicate message and merge its clock.
+        Returns the entry if it should be applied to the store, else None.
+        Caller must hold self.clock_lock (a batch holds it for all its ops).
+        """
+        incoming_clock = msg.get('vector_clock', [])
         source_node = msg.get('source_node', -1)
         entry = msg.get('entry', {})
 
         # --- Skip if this version is already applied ---
-        last_applied = self.applied_versions.get(str(source_node), 0)
-        incoming_version = incoming_clock.get(str(source_node), 0)
+        if len(incoming_clock) != len(self.peers) or not 0 <= source_node < len(self.peers):
+            return None  # not from a peer of this cluster
+        last_applied = self.applied_versions[source_node]
+        incoming_version = incoming_clock[source_node]
         if incoming_version <= last_applied:
-            return {'success': True}  # already applied
+            return None  # already applied
 
         # --- Detect concurrency BEFORE merging clocks ---
-        my_clock = self._get_clock()
+        my_clock = self.vector_clock
         concurrent = self._is_concurrent(my_clock, incoming_clock)
 
         # --- Resolve conflicts ---
@@ -282,24 +400,24 @@ class MasterlessNode:
                 'time': time.time(),
                 'source': source_node,
                 'entry': entry,
-                'my_clock': my_clock,
+                'my_clock': list(my_clock),
                 'their_clock': incoming_clock,
                 'resolution': 'Merged concurrent write'
             })
             # Last-Writer-Wins: higher node_id wins
-            if source_node >= self.node_id:
-                self.store.apply_replication_log(entry)
+            apply = source_node >= self.node_id
         else:
             # Not concurrent → safe to apply
-            self.store.apply_replication_log(entry)
+            apply = True
 
-        # --- Merge clocks after applying ---
-        self._merge_clock(incoming_clock)
+        # --- Merge clocks (max of each component), so the next op in a batch
+        # is compared against this one ---
+        my_clock[:] = map(max, my_clock, incoming_clock)
 
         # --- Update applied_versions ---
-        self.applied_versions[str(source_node)] = incoming_version
+        self.applied_versions[source_node] = incoming_version
 
-        return {'success': True}
+        return entry if apply else None
 
 
 
@@ -312,37 +430,76 @@ class MasterlessNode:
         while self.running:
             time.sleep(0.01) # Faster replication
 
-            # Grab and clear the queue
-            with self.queue_lock:
-                if not self.replication_queue:
-                    continue
-                ops = self.replication_queue[:]
-                self.replication_queue = []
+            # Grab what's queued so far; later writes wait for the next tick
+            queue = self.replication_queue
+            if not queue:
+                continue
+            ops = [queue.popleft() for _ in range(len(queue))]
 
-            # Send each op to every peer (skip self)
-            for peer_idx, (host, port) in enumerate(self.peers):
+            # Ship the tick's ops as a few batch messages, built once for all peers
+            payloads = [_REPLICATE_BATCH_PREFIX + b','.join(ops[i:i + MAX_REPLICATE_BATCH]) + _BATCH_END
+                        for i in range(0, len(ops), MAX_REPLICATE_BATCH)]
+
+            # Send every batch to every peer (skip self)
+            for peer_idx in range(len(self.peers)):
                 if peer_idx == self.node_id:
                     continue
-                for op in ops:
-                    self._send_to_peer(host, port, op)
+                self._send_to_peer(peer_idx, payloads)
 
-    def _send_to_peer(self, host: str, port: int, message: Dict):
-        """Send a single message to a peer. Fire-and-forget."""
-        try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            s.settimeout(1.0)
-            s.connect((host, port))
-            s.sendall(json.dumps(message).encode('utf-8') + b'\n')
-            s.recv(1024)  # Read ack
+    def _connect_peer(self, peer_idx: int) -> socket.socket:
+        host, port = self.peers[peer_idx]
+        s = socket.create_connection((host, port), timeout=1.0)
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return s
+
+    def _send_to_peer(self, peer_idx: int, payloads: List[bytes]) -> bool:
+        """
+        Pipeline encoded message lines to a peer over its persistent
+        connection, then read one ack per line. Fire-and-forget: returns
+        False instead of raising when the peer is unreachable.
+        """
+        while True:
+            s = self.peer_sockets.get(peer_idx)
+            fresh = s is None
+            try:
+                if fresh:
+                    s = self._connect_peer(peer_idx)
+                    self.peer_sockets[peer_idx] = s
+                    self.peer_readers[peer_idx] = s.makefile('rb', buffering=65536)
+                _send_buffers(s, payloads)
+                reader = self.peer_readers[peer_idx]
+                for _ in payloads:
+                    if not reader.readline().endswith(b'\n'):
+                        raise ConnectionError("Peer closed connection")
+                return True
+            except OSError:
+                self._drop_peer(peer_idx)
+                if fresh:
+                    return False  # Peer might be down — that's fine, eventual consistency
+                # Cached socket was stale (peer restarted) - retry once on a new one;
+                # replays are skipped by the peer's applied_versions check
+
+    def _drop_peer(self, peer_idx: int):
+        reader = self.peer_readers.pop(peer_idx, None)
+        if reader:
+            reader.close()
+        s = self.peer_sockets.pop(peer_idx, None)
+        if s:
             s.close()
-        except:
-            pass  # Peer might be down — that's fine, eventual consistency
 
     # =====================================================================
     # STOP
     # =====================================================================
     def stop(self):
         self.running = False
+        if self._wake_w is not None:
+            os.close(self._wake_w)
+            self._wake_w = None
+        with self.connection_workers_lock:
+            for _ in range(self.connection_workers):
+                self.connection_queue.put(None)
+        for peer_idx in list(self.peer_sockets):
+            self._drop_peer(peer_idx)
         self.store.save_indexes()
         self.store.close()
 
@@ -1,15 +1,211 @@
+import asyncio
 import socket
 import json
+import pickle
 import threading
 import os
 import time
 import random
 import subprocess
 import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List, Tuple, Dict, Any
+from typing import Optional, List, Tuple, Dict, Any, Union
 
 from indexing_module import IndexManager
+from codec import dumps as _dumps, loads as _loads
+
+
+# Longest request line a client may send (bulk_set batches can be large)
+MAX_REQUEST_SIZE = 256 << 20
+
+# Kernel socket buffers for client connections; set on the listening socket
+# so accepted sockets inherit them before the TCP window is negotiated
+SOCKET_BUFFER_SIZE = 256 << 10
+
+# Pending-connection queue depth, so connection bursts aren't refused
+LISTEN_BACKLOG = 1024
+
+# Pre-encoded reply lines for the fixed CRUD responses; _process_request
+# returns these as-is and _handle_client writes them without re-encoding
+_OK_TRUE = _dumps({'status': 'ok', 'success': True}) + b'\n'
+_OK_FALSE = _dumps({'status': 'ok', 'success': False}) + b'\n'
+_OK_NO_VALUE = _dumps({'status': 'ok', 'value': None}) + b'\n'
+_INVALID_JSON = _dumps({'status': 'error', 'message': 'Invalid JSON'}) + b'\n'
+
+# Search results kept per KVStore, keyed on (command, query, top_k)
+SEARCH_CACHE_SIZE = 256
+
+# Most keys one bulk_set_range may create; the server builds the whole batch
+# in memory under the store lock
+MAX_BULK_RANGE = 100_000
+
+# Request lines longer than this are decoded on the handler pool rather
+# than the event loop
+INLINE_PARSE_LIMIT = 64 << 10
+
+# fdatasync skips the inode timestamp flush; only available on Linux/BSD
+_datasync = getattr(os, 'fdatasync', os.fsync)
+
+# WAL space is reserved this many bytes at a time so appends inside the
+# reserved range never change the file size (keeps fdatasync cheap)
+WAL_PREALLOCATE_SIZE = 16 << 20
+
+# Recovery reads the WAL this many bytes at a time and parses each chunk's
+# records with a single decoder call
+WAL_REPLAY_CHUNK = 16 << 20
+
+# save_indexes() appends just the changed keys to the index delta log, and
+# rewrites the full indexes file once the log outgrows this fraction of it
+INDEX_DELTA_COMPACT_RATIO = 0.5
+
+
+class GroupCommitWAL:
+    """
+    Append-only log where concurrent writers share fsyncs.
+
+    append() writes the record straight into the file and returns the offset
+    it must become durable at. A background syncer repeatedly snapshots the
+    written offset, issues one fdatasync and advances durable_offset, waking
+    every writer whose record is now covered. Writes that land while a sync is
+    in flight are picked up together by the next one.
+
+    Where posix_fallocate exists the file is grown in WAL_PREALLOCATE_SIZE
+    steps, so it may end in zero padding past the last record. The syncer
+    reserves the next step ahead of time, so appends don't stall on it.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        created = not path.exists()
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+
+        # Drop zero padding and any torn record left by a crash
+        self.offset = self._find_end()
+        os.ftruncate(self.fd, self.offset)
+        self.allocated = self.offset
+        if created:
+            self._sync_dir()
+
+        self.durable_offset = self.offset
+        self.error: Optional[Exception] = None
+        self.closing = False
+        self._cond = threading.Condition()
+        self._syncer = threading.Thread(target=self._sync_loop, daemon=True)
+        self._syncer.start()
+
+    def _find_end(self) -> int:
+        """Offset just past the last complete (newline-terminated) record."""
+        pos = os.fstat(self.fd).st_size
+        while pos > 0:
+            start = max(0, pos - 65536)
+            os.lseek(self.fd, start, os.SEEK_SET)
+            idx = os.read(self.fd, pos - start).rfind(b'\n')
+            if idx != -1:
+                return start + idx + 1
+            pos = start
+        return 0
+
+    def _sync_dir(self):
+        """Make the file's directory entry durable (POSIX only)."""
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        dir_fd = os.open(self.path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    def _reserve(self, end: int):
+        """Grow the preallocated region to cover `end`; full fsync since size changes."""
+        if not hasattr(os, 'posix_fallocate'):
+            return  # Size grows per write; fdatasync still flushes it
+        size = max(end, self.allocated + WAL_PREALLOCATE_SIZE)
+        os.posix_fallocate(self.fd, self.allocated, size - self.allocated)
+        os.fsync(self.fd)
+        self.allocated = size
+
+    def _reserve_ahead(self):
+        """
+        From the syncer: grow the region before appends run out of it. Only
+        an optimization, so a failure (e.g. ENOSPC) is left for the next
+        append's inline _reserve to hit or not.
+        """
+        if not hasattr(os, 'posix_fallocate'):
+            return
+        with self._cond:
+            # Under the lock and only past what appends may write: glibc's
+            # emulated fallocate writes zeros, which must never land on records
+            start = max(self.allocated, self.offset)
+            if start - self.offset >= WAL_PREALLOCATE_SIZE // 4:
+                return
+            size = self.offset + WAL_PREALLOCATE_SIZE
+            try:
+                os.posix_fallocate(self.fd, start, size - start)
+            except OSError:
+                return
+            self.allocated = size
+        try:
+            # Flush the new size now, keeping it out of later fdatasyncs
+            os.fsync(self.fd)
+        except OSError:
+            pass
+
+    def append(self, record: bytes) -> int:
+        """Write a record (not yet durable) and return the offset to wait() on."""
+        with self._cond:
+            end = self.offset + len(record)
+            if end > self.allocated:
+                self._reserve(end)
+            os.lseek(self.fd, self.offset, os.SEEK_SET)
+            view = memoryview(record)
+            while view:
+                view = view[os.write(self.fd, view):]
+            self.offset = end
+            self._cond.notify_all()
+        return end
+
+    def wait(self, offset: int):
+        """Block until everything up to `offset` is on disk."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.durable_offset >= offset or self.error)
+        if self.error:
+            raise IOError(f"WAL sync failed: {self.error}")
+
+    def _sync_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self.offset > self.durable_offset or self.closing)
+                if self.offset == self.durable_offset:
+                    return  # Closing with nothing left to sync
+                target = self.offset
+
+            # Sync outside the lock so new appends can keep landing meanwhile
+            try:
+                _datasync(self.fd)
+            except Exception as e:
+                self.error = e
+            else:
+                self._reserve_ahead()
+
+            with self._cond:
+                self.durable_offset = target
+                self._cond.notify_all()
+            if self.error:
+                return
+
+    def close(self):
+        """Sync pending records, stop the syncer and close the file."""
+        with self._cond:
+            self.closing = True
+            self._cond.notify_all()
+        self._syncer.join()
+        if self.fd is not None:
+            os.ftruncate(self.fd, self.offset)  # Trim unused preallocation
+            os.fsync(self.fd)
+            os.close(self.fd)
+            self.fd = None
 
 
 class KVStore:
@@ -18,20 +214,34 @@ class KVStore:
         self.data_dir.mkdir(parents=True, exist_ok=True)  # Creates ALL parent dirs
 
         self.log_file = self.data_dir / "wal.log"
-        self.snapshot_file = self.data_dir / "snapshot.json"
+        # Pickled: the snapshot is only ever read back by this process, and
+        # pickle dumps/loads a str -> str dict faster than JSON
+        self.snapshot_file = self.data_dir / "snapshot.pkl"
+        self.legacy_snapshot_file = self.data_dir / "snapshot.json"
 
         self.data: Dict[str, str] = {}
         self.lock = threading.Lock()
+        self.snapshot_lock = threading.Lock()  # One snapshot writer at a time (shared temp file)
 
         # Initialize indexing FIRST
         self.index_manager = IndexManager()
         self.index_file = self.data_dir / "indexes.json"
+        self.index_delta_file = self.data_dir / "indexes.delta"
+        # Frames in the delta log only apply to the full save with the same generation
+        self.index_generation = 0
+        self.index_save_lock = threading.Lock()
+
+        # Recent search results, valid only while index_version is unchanged;
+        # every write that touches the index bumps it (under self.lock)
+        self.index_version = 0
+        self.search_cache: OrderedDict = OrderedDict()
+        self.search_cache_lock = threading.Lock()
 
         # Load data from disk
         self._load_from_disk()
 
-        # Open WAL for appending
-        self.log_fd = open(self.log_file, 'ab', buffering=0)
+        # Open WAL for appending (group-committed)
+        self.wal = GroupCommitWAL(self.log_file)
 
         # Load indexes from disk (after data is loaded)
         self._load_indexes()
@@ -39,40 +249,86 @@ class KVStore:
         # Rebuild indexes if they don't exist but we have data
         if not self.index_file.exists() and len(self.data) > 0:
             print(f"Rebuilding indexes for {len(self.data)} keys...")
-            for key, value in self.data.items():
-                self.index_manager.index_value(key, value)
+            self.index_manager.index_values(list(self.data.items()))
 
     def _load_indexes(self):
         """Load indexes from disk."""
         if self.index_file.exists():
             try:
-                with open(self.index_file, 'r') as f:
-                    index_data = json.load(f)
-                self.index_manager = IndexManager.from_dict(index_data)
+                with open(self.index_file, 'rb') as f:
+                    index_data = _loads(f.read())
+                index_manager = IndexManager.from_dict(index_data)
+                self.index_generation = index_data.get('generation', 0)
+                self._replay_index_deltas(index_manager)
+                index_manager.take_delta()  # Replayed changes are on disk already
+                self.index_manager = index_manager
                 print(f"Loaded indexes from {self.index_file}")
             except Exception as e:
                 print(f"Warning: Could not load indexes: {e}")
 
+    def _replay_index_deltas(self, index_manager: IndexManager):
+        """Apply the delta log frames written since the last full index save."""
+        if not self.index_delta_file.exists():
+            return
+        with open(self.index_delta_file, 'rb') as f:
+            for line in f:
+                try:
+                    frame = _loads(line)
+                except ValueError:
+                    break  # Torn last frame
+                if frame.get('generation') == self.index_generation:
+                    index_manager.apply_delta(frame['changes'])
+
     def _load_from_disk(self):
         """Recover state from Snapshot + WAL."""
         if self.snapshot_file.exists():
             try:
-                with open(self.snapshot_file, 'r') as f:
+                with open(self.snapshot_file, 'rb') as f:
+                    self.data = pickle.load(f)
+            except (pickle.UnpicklingError, EOFError, ValueError, IOError):
+                print("Warning: Corrupt snapshot found, ignoring.")
+        elif self.legacy_snapshot_file.exists():
+            try:
+                with open(self.legacy_snapshot_file, 'r') as f:
                     self.data = json.load(f)
             except (json.JSONDecodeError, IOError):
                 print("Warning: Corrupt snapshot found, ignoring.")
 
         if self.log_file.exists():
-            with open(self.log_file, 'r') as f:
-                for line in f:
-                    if not line.strip():
-                        continue
-                    try:
-                        entry = json.loads(line)
-                        self._apply_entry(entry)
-                    except json.JSONDecodeError:
-                        print("Found incomplete WAL entry (crash recovery), discarding.")
-                        continue
+            with open(self.log_file, 'rb') as f:
+                tail = b''
+                while True:
+                    chunk = f.read(WAL_REPLAY_CHUNK)
+                    if not chunk:
+                        break
+                    data = tail + chunk
+                    end = data.rfind(b'\n') + 1
+                    tail = data[end:]
+                    self._replay_records(data[:end])
+                self._replay_records(tail)  # Unterminated: padding or a torn record
+
+    def _replay_records(self, data: bytes):
+        """Apply newline-separated WAL records from data, in order."""
+        records = data.strip(b'\x00\n')
+        if not records:
+            return
+        try:
+            # Records never contain a raw newline, so they parse as one array
+            entries = _loads(b'[' + records.replace(b'\n', b',') + b']')
+        except ValueError:
+            # Blank lines, padding or a torn record - go line by line
+            for line in data.splitlines():
+                if not line.strip(b'\x00').strip():
+                    continue  # Blank line or preallocated zero padding
+                try:
+                    entry = _loads(line)
+                except ValueError:
+                    print("Found incomplete WAL entry (crash recovery), discarding.")
+                    continue
+                self._apply_entry(entry)
+            return
+        for entry in entries:
+            self._apply_entry(entry)
 
     def _apply_entry(self, entry: Dict):
         """Apply a log entry to in-memory data."""
@@ -85,11 +341,13 @@ class KVStore:
             for k, v in entry['items']:
                 self.data[k] = v
 
-    def _write_wal(self, entry: Dict):
-        """Write to WAL with fsync for durability."""
-        line = json.dumps(entry) + '\n'
-        self.log_fd.write(line.encode('utf-8'))
-        os.fsync(self.log_fd.fileno())
+    def _write_wal(self, entry: Dict) -> int:
+        """
+        Append an entry to the WAL. Call under self.lock so log order matches
+        apply order, then pass the returned offset to self.wal.wait() AFTER
+        releasing the lock - that is what lets concurrent writes share a sync.
+        """
+        return self.wal.append(_dumps(entry) + b'\n')
     def get_with_clock(self, key):
         data = self.get(key)
         if data is None:
@@ -106,18 +364,25 @@ class KVStore:
             self.delete(entry['key'])
     def apply_replication_log(self, entry: Dict):
         """Used by replication to apply logs from other nodes."""
-        with self.lock:
-            self._write_wal(entry)
-            self._apply_entry(entry)
+        self.apply_replication_batch([entry])
 
-            # Index replicated data
-            if entry['type'] == 'set':
-                self.index_manager.index_value(entry['key'], entry['value'])
-            elif entry['type'] == 'bulk_set':
-                for k, v in entry['items']:
-                    self.index_manager.index_value(k, v)
-            elif entry['type'] == 'delete':
-                self.index_manager.remove_value(entry['key'])
+    def apply_replication_batch(self, entries: List[Dict]):
+        """Apply a batch of replicated entries in order, waiting for one fsync at the end."""
+        with self.lock:
+            for entry in entries:
+                durable_at = self._write_wal(entry)
+                self._apply_entry(entry)
+
+                # Index replicated data
+                if entry['type'] == 'set':
+                    self.index_manager.index_value(entry['key'], entry['value'])
+                elif entry['type'] == 'bulk_set':
+                    self.index_manager.index_values(entry['items'])
+                elif entry['type'] == 'delete':
+                    self.index_manager.remove_value(entry['key'])
+            self.index_version += 1
+        if entries:
+            self.wal.wait(durable_at)
 
     # =====================================================================
     # CRUD
@@ -125,95 +390,184 @@ class KVStore:
     def set(self, key: str, value: str) -> bool:
         entry = {'type': 'set', 'key': key, 'value': value}
         with self.lock:
-            self._write_wal(entry)
+            durable_at = self._write_wal(entry)
             self._apply_entry(entry)
             self.index_manager.index_value(key, value)
+            self.index_version += 1
+        self.wal.wait(durable_at)
         return True
 
     def get(self, key: str) -> Optional[str]:
         with self.lock:
             return self.data.get(key)
 
+    def get_many(self, keys: List[str]) -> Dict[str, Optional[str]]:
+        """Values for several keys (None if missing), read under one lock acquisition."""
+        with self.lock:
+            return {key: self.data.get(key) for key in keys}
+
     def delete(self, key: str) -> bool:
         with self.lock:
             if key not in self.data:
                 return False
             entry = {'type': 'delete', 'key': key}
-            self._write_wal(entry)
+            durable_at = self._write_wal(entry)
             self._apply_entry(entry)
             self.index_manager.remove_value(key)
+            self.index_version += 1
+        self.wal.wait(durable_at)
         return True
 
     def bulk_set(self, items: List[Tuple[str, str]]) -> bool:
         entry = {'type': 'bulk_set', 'items': items}
         with self.lock:
-            self._write_wal(entry)
+            durable_at = self._write_wal(entry)
             self._apply_entry(entry)
-            for key, value in items:
-                self.index_manager.index_value(key, value)
+            self.index_manager.index_values(items)
+            self.index_version += 1
+        self.wal.wait(durable_at)
         return True
 
     # =====================================================================
     # SEARCH
     # =====================================================================
     def full_text_search(self, query: str, top_k: int = 10):
-        return self.index_manager.full_text_search(query, top_k)
+        return self._cached_search(('full_text_search', query, top_k),
+                                   self.index_manager.full_text_search, query, top_k)
 
     def semantic_search(self, query: str, top_k: int = 10):
-        return self.index_manager.semantic_search(query, top_k)
+        return self._cached_search(('semantic_search', query, top_k),
+                                   self.index_manager.semantic_search, query, top_k)
 
     def phrase_search(self, phrase: str):
-        return self.index_manager.phrase_search(phrase)
+        return self._cached_search(('phrase_search', phrase, None),
+                                   self.index_manager.phrase_search, phrase)
+
+    def _cached_search(self, cache_key: Tuple, search, *args):
+        """Return search(*args), reusing the last result if the index hasn't changed since."""
+        # Read the version before searching: a write that lands mid-search
+        # leaves the stored result already stale, never wrongly fresh
+        version = self.index_version
+        with self.search_cache_lock:
+            hit = self.search_cache.get(cache_key)
+            if hit is not None and hit[0] == version:
+                self.search_cache.move_to_end(cache_key)
+                return hit[1]
+
+        results = search(*args)
+
+        with self.search_cache_lock:
+            self.search_cache[cache_key] = (version, results)
+            self.search_cache.move_to_end(cache_key)
+            if len(self.search_cache) > SEARCH_CACHE_SIZE:
+                self.search_cache.popitem(last=False)
+        return results
 
     # =====================================================================
     # SNAPSHOT + INDEX PERSISTENCE
     # =====================================================================
     def save_snapshot(self, debug_chaos: bool = False) -> bool:
         """Compacts WAL into a snapshot."""
-        with self.lock:
-            if debug_chaos and random.random() < 0.50:
-                return False
+        with self.snapshot_lock:
+            # Only the dict copy needs the store lock; encoding and disk I/O
+            # run on the copy while gets and sets carry on
+            with self.lock:
+                if debug_chaos and random.random() < 0.50:
+                    return False
+                data = dict(self.data)
 
             # Ensure directory exists
             self.data_dir.mkdir(parents=True, exist_ok=True)
 
+            payload = memoryview(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL))
+            del data
             temp_file = self.snapshot_file.with_suffix('.tmp')
-            with open(temp_file, 'w') as f:
-                json.dump(self.data, f)
+            fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+            try:
+                while payload:
+                    payload = payload[os.write(fd, payload):]
+                os.fsync(fd)
+                # Written once and only read back on restart - keep it out of the page cache
+                if hasattr(os, 'posix_fadvise'):
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
 
             os.replace(temp_file, self.snapshot_file)
             return True
 
     def save_indexes(self):
-        """Save indexes to disk safely using atomic write."""
+        """
+        Save indexes to disk: append the keys changed since the last save to
+        the delta log, or rewrite the full indexes file (atomically) when
+        there is none yet or the log has grown too large.
+        """
         try:
-            with self.lock:
-                index_data = self.index_manager.to_dict()
-
-            # Ensure directory exists BEFORE writing temp file
-            self.data_dir.mkdir(parents=True, exist_ok=True)
+            with self.index_save_lock:
+                # Ensure directory exists BEFORE writing temp file
+                self.data_dir.mkdir(parents=True, exist_ok=True)
 
-            temp_file = self.index_file.with_suffix('.tmp')
-            with open(temp_file, 'w') as f:
-                json.dump(index_data, f)
-
-            os.replace(temp_file, self.index_file)
-            return True
+                with self.lock:
+                    delta = self.index_manager.take_delta()
+                try:
+                    if self._index_delta_fits():
+                        if delta:
+                            self._append_index_delta(delta)
+                        return True
+
+                    # Full save; the delta just taken is covered by it
+                    with self.lock:
+                        index_data = self.index_manager.to_dict()
+                    index_data['generation'] = self.index_generation + 1
+
+                    # One-shot encode: json.dump's chunked iterencode is several
+                    # times slower than the C encoder (or orjson) on the whole dict
+                    temp_file = self.index_file.with_suffix('.tmp')
+                    with open(temp_file, 'wb') as f:
+                        f.write(_dumps(index_data))
+
+                    os.replace(temp_file, self.index_file)
+                    # Older frames now carry a stale generation, so a crash before
+                    # this truncate can't replay them over the new file
+                    self.index_generation += 1
+                    with open(self.index_delta_file, 'wb'):
+                        pass
+                    return True
+                except Exception:
+                    # Unsaved changes go back in the delta, or no later save would write them
+                    with self.lock:
+                        self.index_manager.restore_delta(delta)
+                    raise
         except Exception as e:
             print(f"Error saving indexes: {e}")
             return False
 
+    def _index_delta_fits(self) -> bool:
+        """True while appending to the delta log is cheaper than a full save."""
+        try:
+            full_size = self.index_file.stat().st_size
+        except FileNotFoundError:
+            return False
+        try:
+            delta_size = self.index_delta_file.stat().st_size
+        except FileNotFoundError:
+            delta_size = 0
+        return delta_size <= full_size * INDEX_DELTA_COMPACT_RATIO
+
+    def _append_index_delta(self, delta: Dict[str, Optional[str]]):
+        frame = _dumps({'generation': self.index_generation, 'changes': delta}) + b'\n'
+        with open(self.index_delta_file, 'ab') as f:
+            f.write(frame)
+            f.flush()
+            _datasync(f.fileno())
+
     # =====================================================================
     # CLOSE
     # =====================================================================
     def close(self):
         """Gracefully close the file handle."""
-        if self.log_fd:
-            try:
-                os.fsync(self.log_fd.fileno())
-                self.log_fd.close()
-            except ValueError:
-                pass  # Already closed
+        if self.wal:
+            self.wal.close()
 
 
 # ============================================================================
@@ -228,7 +582,28 @@ class KVServer:
         self.port = port
         self.store = KVStore(data_dir)
         self.running = False
-        self.server_socket = None
+
+        # One asyncio loop multiplexes every connection; KVStore calls block
+        # (locks, WAL syncs), so requests run on this pool. Many workers let
+        # concurrent writers share a WAL sync.
+        self.handler_pool = ThreadPoolExecutor(max_workers=64)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._stopped = threading.Event()
+
+        # Command name -> handler; one dict lookup per request instead of a
+        # string comparison per branch
+        self._handlers = {
+            'full_text_search': self._handle_full_text_search,
+            'phrase_search': self._handle_phrase_search,
+            'semantic_search': self._handle_semantic_search,
+            'save_indexes': self._handle_save_indexes,
+            'set': self._handle_set,
+            'get': self._handle_get,
+            'delete': self._handle_delete,
+            'bulk_set': self._handle_bulk_set,
+            'bulk_set_range': self._handle_bulk_set_range,
+        }
 
     def _auto_save_indexes(self):
         """Periodically save indexes to disk."""
@@ -238,11 +613,22 @@ class KVServer:
                 self.store.save_indexes()
 
     def start(self):
-        """Start the TCP server."""
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server_socket.bind((self.host, self.port))
-        self.server_socket.listen(5)
+        """Start the TCP server; blocks until stop() is called."""
+        asyncio.run(self._serve())
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+        sock.bind((self.host, self.port))
+        # asyncio already sets TCP_NODELAY on every accepted TCP transport and
+        # reads up to 256 KiB per recv
+        server = await asyncio.start_server(self._handle_client, sock=sock,
+                                            backlog=LISTEN_BACKLOG,
+                                            limit=MAX_REQUEST_SIZE)
         self.running = True
 
         # Start auto-save thread
@@ -250,95 +636,131 @@ class KVServer:
 
         print(f"KVStore server listening on {self.host}:{self.port}")
 
-        while self.running:
-            try:
-                self.server_socket.settimeout(1.0)
-                try:
-                    client_socket, addr = self.server_socket.accept()
-                    thread = threading.Thread(target=self._handle_client, args=(client_socket,))
-                    thread.daemon = True
-                    thread.start()
-                except socket.timeout:
-                    continue
-            except Exception as e:
-                if self.running:
-                    print(f"Server error: {e}")
-                break
+        try:
+            await self._stop_event.wait()
+        finally:
+            server.close()  # Frees the port; open connections are cancelled by asyncio.run
+            self._stopped.set()
 
-    def _handle_client(self, client_socket: socket.socket):
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
         """Handle a client connection."""
-        buffer = b""
+        loop = asyncio.get_running_loop()
         try:
             while True:
-                chunk = client_socket.recv(4096)
-                if not chunk:
-                    break
-
-                buffer += chunk
-
-                while b'\n' in buffer:
-                    line, buffer = buffer.split(b'\n', 1)
-                    if line:
-                        try:
-                            request = json.loads(line.decode('utf-8'))
-                            response = self._process_request(request)
-                            client_socket.sendall(json.dumps(response).encode('utf-8') + b'\n')
-                        except json.JSONDecodeError:
-                            error_response = {'status': 'error', 'message': 'Invalid JSON'}
-                            client_socket.sendall(json.dumps(error_response).encode('utf-8') + b'\n')
-        except Exception as e:
-            pass  # Client disconnected
+                line = await reader.readline()
+                if not line:
+                    break  # Client disconnected
+                if line.isspace():
+                    continue
+
+                if len(line) > INLINE_PARSE_LIMIT:
+                    # Decoding a large batch would stall every other client
+                    response = await loop.run_in_executor(self.handler_pool, self._handle_line, line)
+                else:
+                    try:
+                        request = _loads(line)
+                    except json.JSONDecodeError:
+                        response = _INVALID_JSON
+                    else:
+                        # Every command, get included, may wait on the store
+                        # lock, which bulk writes hold for a long time, so none
+                        # run on the event loop
+                        response = await loop.run_in_executor(self.handler_pool, self._respond, request)
+                writer.write(response)
+                await writer.drain()
+        except (Exception, asyncio.CancelledError):
+            pass  # Client disconnected, or the server is stopping
         finally:
-            client_socket.close()
+            writer.close()
 
-    def _process_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
-        """Process a client request and return response."""
+    def _handle_line(self, line: bytes) -> bytes:
+        """Decode one request line and return its encoded reply line."""
+        try:
+            request = _loads(line)
+        except json.JSONDecodeError:
+            return _INVALID_JSON
+        return self._respond(request)
+
+    def _respond(self, request: Dict[str, Any]) -> bytes:
+        """Process a decoded request and return its encoded reply line."""
+        response = self._process_request(request)
+        if 'id' in request:
+            # Lets pipelined clients match replies
+            if type(response) is bytes:
+                return b'%s,"id":%s}\n' % (response[:-2], _dumps(request['id']))
+            response['id'] = request['id']
+        if type(response) is not bytes:
+            response = _dumps(response) + b'\n'
+        return response
+
+    def _process_request(self, request: Dict[str, Any]) -> Union[Dict[str, Any], bytes]:
+        """Process a client request and return response (a dict, or a pre-encoded line)."""
         cmd = request.get('command')
-
-        # --- Search commands ---
-        if cmd == 'full_text_search':
-            results = self.store.full_text_search(request.get('query', ''), request.get('top_k', 10))
-            return {'status': 'ok', 'results': results}
-
-        elif cmd == 'phrase_search':
-            results = self.store.phrase_search(request.get('phrase', ''))
-            return {'status': 'ok', 'results': results}
-
-        elif cmd == 'semantic_search':
-            results = self.store.semantic_search(request.get('query', ''), request.get('top_k', 10))
-            return {'status': 'ok', 'results': results}
-
-        elif cmd == 'save_indexes':
-            success = self.store.save_indexes()
-            return {'status': 'ok', 'success': success}
-
-        # --- CRUD commands ---
-        elif cmd == 'set':
-            success = self.store.set(request.get('key'), request.get('value'))
-            return {'status': 'ok', 'success': success}
-
-        elif cmd == 'get':
-            value = self.store.get(request.get('key'))
-            return {'status': 'ok', 'value': value}
-
-        elif cmd == 'delete':
-            success = self.store.delete(request.get('key'))
-            return {'status': 'ok', 'success': success}
-
-        elif cmd == 'bulk_set':
-            items = request.get('items', [])
-            items = [(item['key'], item['value']) for item in items]
-            success = self.store.bulk_set(items)
-            return {'status': 'ok', 'success': success}
-
-        else:
+        handler = self._handlers.get(cmd) if isinstance(cmd, str) else None
+        if handler is None:
             return {'status': 'error', 'message': f'Unknown command: {cmd}'}
+        return handler(request)
+
+    # --- Search commands ---
+    def _handle_full_text_search(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        results = self.store.full_text_search(request.get('query', ''), request.get('top_k', 10))
+        return {'status': 'ok', 'results': results}
+
+    def _handle_phrase_search(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        results = self.store.phrase_search(request.get('phrase', ''))
+        return {'status': 'ok', 'results': results}
+
+    def _handle_semantic_search(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        results = self.store.semantic_search(request.get('query', ''), request.get('top_k', 10))
+        return {'status': 'ok', 'results': results}
+
+    def _handle_save_indexes(self, request: Dict[str, Any]) -> bytes:
+        success = self.store.save_indexes()
+        return _OK_TRUE if success else _OK_FALSE
+
+    # --- CRUD commands ---
+    def _handle_set(self, request: Dict[str, Any]) -> bytes:
+        success = self.store.set(request.get('key'), request.get('value'))
+        return _OK_TRUE if success else _OK_FALSE
+
+    def _handle_get(self, request: Dict[str, Any]) -> Union[Dict[str, Any], bytes]:
+        value = self.store.get(request.get('key'))
+        if value is None:
+            return _OK_NO_VALUE
+        return {'status': 'ok', 'value': value}
+
+    def _handle_delete(self, request: Dict[str, Any]) -> bytes:
+        success = self.store.delete(request.get('key'))
+        return _OK_TRUE if success else _OK_FALSE
+
+    def _handle_bulk_set(self, request: Dict[str, Any]) -> bytes:
+        items = request.get('items', [])
+        items = [(item['key'], item['value']) for item in items]
+        success = self.store.bulk_set(items)
+        return _OK_TRUE if success else _OK_FALSE
+
+    def _handle_bulk_set_range(self, request: Dict[str, Any]) -> Union[Dict[str, Any], bytes]:
+        # One atomic bulk_set of prefix0 .. prefix<count-1>, all set to value
+        prefix, value, count = request.get('prefix', ''), request.get('value'), request.get('count', 0)
+        if not isinstance(prefix, str) or not isinstance(value, str):
+            return {'status': 'error', 'success': False, 'message': 'prefix and value must be strings'}
+        if type(count) is not int or not 0 <= count <= MAX_BULK_RANGE:
+            return {'status': 'error', 'success': False,
+                    'message': f'count must be an integer from 0 to {MAX_BULK_RANGE}'}
+        items = [(f'{prefix}{i}', value) for i in range(count)]
+        success = self.store.bulk_set(items)
+        return _OK_TRUE if success else _OK_FALSE
 
     def stop(self):
         """Stop the server gracefully."""
         self.running = False
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._stop_event.set)
+                self._stopped.wait(5.0)  # Listening socket closed - the port is free again
+            except RuntimeError:
+                pass  # Loop already finished
+        self.handler_pool.shutdown(wait=False)
         print("Saving indexes...")
         self.store.save_indexes()
-        if self.server_socket:
-            self.server_socket.close()
         self.store.close()
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+test_helpers.py
+Wire helpers shared by tests.py and test_replication_mastrless.py.
+"""
+
+import socket
+import threading
+
+from codec import dumps as _dumps, loads as _loads
+
+
+def _frame(msg):
+    """Wire line for msg; bytes are taken as an already-encoded frame."""
+    return msg if isinstance(msg, bytes) else _dumps(msg) + b'\n'
+
+# Leader scans ping every node on every pass, so encode the ping once
+PING_FRAME = _frame({'type': 'get', 'key': '__ping__'})
+
+
+# One open connection per (thread, port); nodes serve any number of
+# newline-delimited requests per connection, so there's no reason to pay a
+# connect + teardown for each one
+_CONN = threading.local()
+
+
+def _get_conn(port, timeout):
+    """This thread's (socket, reader) for port, connecting on first use."""
+    conns = getattr(_CONN, 'conns', None)
+    if conns is None:
+        conns = _CONN.conns = {}
+    conn = conns.get(port)
+    if conn is None:
+        s = socket.create_connection(('localhost', port), timeout=timeout)
+        conn = conns[port] = (s, s.makefile('rb'))
+    else:
+        conn[0].settimeout(timeout)
+    return conn
+
+
+def _drop_conn(port):
+    """Close this thread's connection to port, if it has one."""
+    conn = getattr(_CONN, 'conns', {}).pop(port, None)
+    if conn is not None:
+        conn[1].close()
+        conn[0].close()
+
+
+def close_all():
+    """Close every connection opened by the calling thread."""
+    for port in list(getattr(_CONN, 'conns', {})):
+        _drop_conn(port)
+
+
+def send_to_each(requests, timeout=2.0):
+    """
+    Send each (port, msg) on this thread's connection to that port, then read
+    the replies: all nodes are asked at once, so the whole call costs about
+    one round-trip. Returns one parsed reply per request, None on failure.
+    """
+    readers = []
+    for port, msg in requests:
+        try:
+            s, reader = _get_conn(port, timeout)
+            s.sendall(_frame(msg))
+            readers.append(reader)
+        except OSError:
+            _drop_conn(port)
+            readers.append(None)
+    replies = []
+    for (port, _), reader in zip(requests, readers):
+        try:
+            data = reader.readline() if reader is not None else b''
+            replies.append(_loads(data) if data else None)
+        except (OSError, ValueError):
+            replies.append(None)
+        if replies[-1] is None:
+            _drop_conn(port)
+    return replies
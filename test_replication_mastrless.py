@@ -10,20 +10,33 @@ Each section:
   - Prints a comparison table at the end
 """
 
-import subprocess
+import io
+import multiprocessing
 import sys
 import socket
-import json
 import time
 import os
 import shutil
 import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from codec import loads as _loads
+from test_helpers import _frame, PING_FRAME, _CONN, _get_conn, _drop_conn, close_all, send_to_each
 
 
 # ============================================================================
 # HELPERS
 # ============================================================================
 
+# Nodes run as processes forked from a server that has already imported the
+# node modules, so bringing one up costs neither interpreter start nor imports
+if 'forkserver' in multiprocessing.get_all_start_methods():
+    _NODE_CTX = multiprocessing.get_context('forkserver')
+    _NODE_CTX.set_forkserver_preload(['cluster', 'masterless_replication'])
+else:
+    _NODE_CTX = multiprocessing.get_context('spawn')  # Windows
+
+
 def cleanup_dir(path):
     """Retry-based cleanup for Windows."""
     if not os.path.exists(path):
@@ -38,56 +51,142 @@ def cleanup_dir(path):
             return
 
 
+# Writer threads for the concurrent-write tests, started once and reused by
+# both phases (which may run at the same time)
+_POOL = ThreadPoolExecutor(max_workers=8)
+
+
 def send_req(port, msg, timeout=2.0):
     """Send a JSON request to a node, return parsed response or None."""
+    backoff = 0.05
     for _ in range(3):
+        reused = port in getattr(_CONN, 'conns', {})
         try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            s.settimeout(timeout)
-            s.connect(('localhost', port))
-            s.sendall(json.dumps(msg).encode('utf-8') + b'\n')
-            data = s.recv(4096)
-            s.close()
-            if data:
-                return json.loads(data.decode().strip())
-        except:
-            time.sleep(0.5)
+            s, reader = _get_conn(port, timeout)
+            s.sendall(_frame(msg))
+            data = reader.readline()
+            if not data:
+                raise ConnectionError("connection closed")
+            return _loads(data)
+        except OSError:
+            # A late reply must never be read as the next request's, so any
+            # failure retires the connection
+            _drop_conn(port)
+            if not reused:
+                time.sleep(backoff)  # A stale pooled socket is retried at once
+                backoff *= 2
+        except ValueError:
+            # A garbled reply won't improve on retry
+            _drop_conn(port)
+            return None
     return None
 
 
+def send_pipelined(port, msgs, timeout=2.0):
+    """
+    Send every message back to back on one connection, then read the replies
+    in order: one round-trip for the batch. Returns one parsed reply per
+    message, None for any not received.
+    """
+    replies = []
+    try:
+        s, reader = _get_conn(port, timeout)
+        s.sendall(b''.join(_frame(msg) for msg in msgs))
+        for _ in msgs:
+            data = reader.readline()
+            if not data:
+                break
+            replies.append(_loads(data))
+    except (OSError, ValueError):
+        pass
+    finally:
+        if len(replies) < len(msgs):
+            _drop_conn(port)  # Unread replies would pair up with later requests
+    replies.extend([None] * (len(msgs) - len(replies)))
+    return replies
+
+
+def wait_until(pred, timeout, interval=0.02):
+    """
+    Call pred until it returns something truthy and return that, or False
+    after timeout seconds. The poll interval doubles from `interval` up to
+    0.2 s, so fast conditions are seen at once without spinning on slow ones.
+    """
+    deadline = time.time() + timeout
+    while True:
+        result = pred()
+        if result:
+            return result
+        if time.time() >= deadline:
+            return False
+        time.sleep(min(interval, max(0.0, deadline - time.time())))
+        interval = min(interval * 2, 0.2)
+
+
+def _port_open(port):
+    try:
+        socket.create_connection(('localhost', port), timeout=1.0).close()
+        return True
+    except OSError:
+        return False
+
+
 def wait_for_port(port, timeout=10):
     """Wait until a port is accepting connections."""
-    start = time.time()
-    while time.time() - start < timeout:
-        try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            s.settimeout(1.0)
-            s.connect(('localhost', port))
-            s.close()
-            return True
-        except:
-            time.sleep(0.3)
-    return False
+    return wait_until(lambda: _port_open(port), timeout)
+
+
+def wait_for_ports(ports, timeout=10):
+    """Wait for several ports at once; returns one bool per port."""
+    with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+        return list(pool.map(lambda port: wait_for_port(port, timeout), ports))
+
+
+def wait_for_value(port, key, expected, timeout):
+    """Wait until the node on port returns expected for key; True if it did."""
+    def check():
+        resp = send_req(port, {'type': 'get', 'key': key})
+        return bool(resp) and resp.get('value') == expected
+    return wait_until(check, timeout)
 
 
 def kill_proc(proc):
-    """Kill a subprocess safely."""
-    if proc and proc.poll() is None:
-        if os.name == 'nt':
-            try:
-                subprocess.run(['taskkill', '/F', '/PID', str(proc.pid)],
-                               capture_output=True, timeout=3)
-            except:
-                proc.kill()
-        else:
-            try:
-                os.kill(proc.pid, 9)
-            except:
-                proc.kill()
+    """Kill a node process safely."""
+    if proc and proc.is_alive():
         try:
-            proc.wait(timeout=3)
-        except:
-            pass
+            os.kill(proc.pid, 9)  # SIGKILL; TerminateProcess on Windows
+        except OSError:
+            proc.kill()
+        proc.join(timeout=3)
+
+
+def _quiet_node_output():
+    """Discard a node's prints, which would interleave with the test report."""
+    sys.stdout = sys.stderr = open(os.devnull, 'w')
+
+
+def _run_raft_node(node_id, peers):
+    """Node process body: run one ClusterNode until killed."""
+    _quiet_node_output()
+    from cluster import ClusterNode
+    ClusterNode(node_id, peers)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+
+def _run_masterless_node(node_id, peers):
+    """Node process body: run one MasterlessNode until killed."""
+    _quiet_node_output()
+    from masterless_replication import MasterlessNode
+    node = MasterlessNode(node_id, peers)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        node.stop()
 
 
 # ============================================================================
@@ -99,45 +198,35 @@ RAFT_PORTS = [8100, 8101, 8102]
 
 
 def start_raft_cluster():
-    """Start 3 Raft nodes as subprocesses. Returns list of Popen."""
+    """Start 3 Raft nodes as processes. Returns list of Process."""
+    peers = [('localhost', port) for port in RAFT_PORTS]
     procs = []
     for i in range(3):
-        cmd = [sys.executable, 'cluster.py', str(i)]
-        # Override ports by patching the peers list inside cluster.py
-        # We use a wrapper that sets the correct ports
-        wrapper = (
-            f"import sys; sys.argv = ['cluster.py', '{i}']\n"
-            f"peers = [('localhost', {RAFT_PORTS[0]}), ('localhost', {RAFT_PORTS[1]}), ('localhost', {RAFT_PORTS[2]})]\n"
-            f"from cluster import ClusterNode\n"
-            f"node = ClusterNode({i}, peers)\n"
-            f"import time\n"
-            f"try:\n"
-            f"    while True: time.sleep(1)\n"
-            f"except KeyboardInterrupt: pass\n"
-        )
-        proc = subprocess.Popen(
-            [sys.executable, '-c', wrapper],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
+        proc = _NODE_CTX.Process(target=_run_raft_node, args=(i, peers), daemon=True)
+        proc.start()
         procs.append(proc)
     return procs
 
 
-def find_raft_leader(ports=RAFT_PORTS):
-    """Poll nodes to find which one is the Raft leader."""
-    for _ in range(15):
-        for i, port in enumerate(ports):
-            resp = send_req(port, {'type': 'get', 'key': '__ping__'})
-            if resp:
-                if resp.get('status') == 'ok':
-                    return i, port
-                if resp.get('status') == 'redirect':
-                    leader_id = resp.get('leader_id')
-                    if leader_id is not None:
-                        return leader_id, ports[leader_id]
-        time.sleep(1.0)
-    return None, None
+def _probe_raft_leader(ports, exclude):
+    """Ping every node at once; returns (leader_id, port) or None."""
+    candidates = [i for i in range(len(ports)) if i != exclude]
+    replies = send_to_each([(ports[i], PING_FRAME) for i in candidates])
+    # A node that answers is the leader itself; otherwise trust a redirect
+    for i, resp in zip(candidates, replies):
+        if resp and resp.get('status') == 'ok':
+            return i, ports[i]
+    for resp in replies:
+        if resp and resp.get('status') == 'redirect':
+            leader_id = resp.get('leader_id')
+            if leader_id is not None and leader_id != exclude:
+                return leader_id, ports[leader_id]
+    return None
+
+
+def find_raft_leader(ports=RAFT_PORTS, exclude=None, timeout=15):
+    """Poll nodes until one is the Raft leader (other than node `exclude`)."""
+    return wait_until(lambda: _probe_raft_leader(ports, exclude), timeout) or (None, None)
 
 
 def run_raft_tests():
@@ -159,9 +248,7 @@ def run_raft_tests():
     try:
         # Wait for cluster to start
         print("\n⏳ Waiting for Raft cluster to elect a leader...")
-        for port in RAFT_PORTS:
-            wait_for_port(port, timeout=8)
-        time.sleep(2)
+        wait_for_ports(RAFT_PORTS, timeout=8)
 
         leader_id, leader_port = find_raft_leader()
         if leader_id is None:
@@ -180,7 +267,7 @@ def run_raft_tests():
         else:
             print(f"  ❌ FAILED — response: {resp}")
 
-        time.sleep(0.5)  # Let replication happen
+        wait_for_value(leader_port, 'raft_key1', 'hello_raft', timeout=2)  # Let replication happen
 
         # ---------------------------------------------------------
         # TEST 2: Read from follower (data replicated?)
@@ -201,9 +288,8 @@ def run_raft_tests():
         print("\n💀 Test 3: Kill leader, wait for failover")
         kill_proc(procs[leader_id])
         print(f"  Killed Node {leader_id}, waiting for new election...")
-        time.sleep(6)  # Raft election timeout
-
-        new_leader_id, new_leader_port = find_raft_leader()
+        # Election timeout is 1.5-3 s; take the first leader other than the dead one
+        new_leader_id, new_leader_port = find_raft_leader(exclude=leader_id)
         if new_leader_id is not None and new_leader_id != leader_id:
             results['failover'] = True
             print(f"  ✓ PASSED — new leader: Node {new_leader_id}")
@@ -229,18 +315,19 @@ def run_raft_tests():
         errors = []
 
         def writer(start_idx, count):
-            for i in range(start_idx, start_idx + count):
-                r = send_req(new_leader_port, {'type': 'set', 'key': f'raft_conc_{i}', 'value': f'val_{i}'})
+            indices = range(start_idx, start_idx + count)
+            try:
+                replies = send_pipelined(new_leader_port, [
+                    {'type': 'set', 'key': f'raft_conc_{i}', 'value': f'val_{i}'} for i in indices])
+            finally:
+                close_all()
+            for i, r in zip(indices, replies):
                 if not r or r.get('status') != 'ok':
                     errors.append(i)
 
-        threads = []
-        for t_id in range(4):
-            t = threading.Thread(target=writer, args=(t_id * 25, 25))
-            threads.append(t)
-            t.start()
-        for t in threads:
-            t.join()
+        futures = [_POOL.submit(writer, t_id * 25, 25) for t_id in range(4)]
+        for future in futures:
+            future.result()
 
         if len(errors) == 0:
             results['concurrent_writes'] = True
@@ -249,9 +336,9 @@ def run_raft_tests():
             print(f"  ❌ FAILED — {len(errors)} writes failed")
 
     finally:
+        close_all()
         for p in procs:
             kill_proc(p)
-        time.sleep(1)
 
     return results
 
@@ -265,23 +352,12 @@ MASTERLESS_PORTS = [9100, 9101, 9102]
 
 
 def start_masterless_cluster():
-    """Start 3 Masterless nodes as subprocesses."""
+    """Start 3 Masterless nodes as processes."""
+    peers = [('localhost', port) for port in MASTERLESS_PORTS]
     procs = []
     for i in range(3):
-        wrapper = (
-            f"from masterless_replication import MasterlessNode\n"
-            f"peers = [('localhost', {MASTERLESS_PORTS[0]}), ('localhost', {MASTERLESS_PORTS[1]}), ('localhost', {MASTERLESS_PORTS[2]})]\n"
-            f"node = MasterlessNode({i}, peers)\n"
-            f"import time\n"
-            f"try:\n"
-            f"    while True: time.sleep(1)\n"
-            f"except KeyboardInterrupt: node.stop()\n"
-        )
-        proc = subprocess.Popen(
-            [sys.executable, '-c', wrapper],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
+        proc = _NODE_CTX.Process(target=_run_masterless_node, args=(i, peers), daemon=True)
+        proc.start()
         procs.append(proc)
     return procs
 
@@ -298,6 +374,7 @@ def run_masterless_tests():
         'node_failure_tolerance': False,
         'write_after_node_failure': False,
         'concurrent_writes_all_nodes': False,
+        'concurrent_writes_one_node': False,
     }
 
     procs = start_masterless_cluster()
@@ -305,8 +382,8 @@ def run_masterless_tests():
     try:
         # Wait for all nodes to start
         print("\n⏳ Waiting for Masterless cluster to start...")
-        for port in MASTERLESS_PORTS:
-            if not wait_for_port(port, timeout=8):
+        for port, up in zip(MASTERLESS_PORTS, wait_for_ports(MASTERLESS_PORTS, timeout=8)):
+            if not up:
                 print(f"  ❌ Node on port {port} did not start")
                 return results
         print("  ✓ All 3 nodes are up")
@@ -322,7 +399,7 @@ def run_masterless_tests():
         else:
             print(f"  ❌ FAILED — response: {resp}")
 
-        time.sleep(0.5)  # Let async replication propagate
+        wait_for_value(MASTERLESS_PORTS[2], 'ml_key1', 'hello_masterless', timeout=1)  # Let async replication propagate
 
         # ---------------------------------------------------------
         # TEST 2: Read from a DIFFERENT node (node 2)
@@ -335,9 +412,7 @@ def run_masterless_tests():
         else:
             print(f"  ❌ FAILED — value: {resp}")
             # Maybe replication is slow, retry
-            time.sleep(1)
-            resp = send_req(MASTERLESS_PORTS[2], {'type': 'get', 'key': 'ml_key1'})
-            if resp and resp.get('value') == 'hello_masterless':
+            if wait_for_value(MASTERLESS_PORTS[2], 'ml_key1', 'hello_masterless', timeout=1):
                 results['read_from_any_node'] = True
                 print("  ✓ PASSED (after retry) — replicated to Node 2")
 
@@ -347,7 +422,6 @@ def run_masterless_tests():
         print("\n💀 Test 3: Kill Node 1, check other nodes still work")
         kill_proc(procs[1])
         print("  Killed Node 1...")
-        time.sleep(1)
 
         # Write to Node 0, read from Node 2
         resp = send_req(MASTERLESS_PORTS[0], {'type': 'set', 'key': 'ml_key2', 'value': 'after_kill'})
@@ -357,22 +431,18 @@ def run_masterless_tests():
         else:
             print(f"  ❌ FAILED — response: {resp}")
 
-        time.sleep(0.5)
-
         # ---------------------------------------------------------
         # TEST 4: Read the value written after kill from Node 2
         # ---------------------------------------------------------
         print("\n📖 Test 4: Read 'after_kill' from Node 2")
-        time.sleep(0.5)
+        wait_for_value(MASTERLESS_PORTS[2], 'ml_key2', 'after_kill', timeout=1)
         resp = send_req(MASTERLESS_PORTS[2], {'type': 'get', 'key': 'ml_key2'})
         if resp and resp.get('value') == 'after_kill':
             results['write_after_node_failure'] = True
             print("  ✓ PASSED — data replicated to Node 2 (skipping dead Node 1)")
         else:
             print(f"  ❌ FAILED — value: {resp}")
-            time.sleep(1)
-            resp = send_req(MASTERLESS_PORTS[2], {'type': 'get', 'key': 'ml_key2'})
-            if resp and resp.get('value') == 'after_kill':
+            if wait_for_value(MASTERLESS_PORTS[2], 'ml_key2', 'after_kill', timeout=1):
                 results['write_after_node_failure'] = True
                 print("  ✓ PASSED (after retry)")
 
@@ -383,32 +453,36 @@ def run_masterless_tests():
         errors = []
 
         def writer(port, prefix, count):
-            for i in range(count):
-                r = send_req(port, {'type': 'set', 'key': f'{prefix}_{i}', 'value': f'val_{i}'})
+            try:
+                replies = send_pipelined(port, [
+                    {'type': 'set', 'key': f'{prefix}_{i}', 'value': f'val_{i}'} for i in range(count)])
+            finally:
+                close_all()
+            for i, r in enumerate(replies):
                 if not r or not r.get('success'):
                     errors.append((port, i))
 
         # Write 25 keys to Node 0 and 25 keys to Node 2 simultaneously
-        t0 = threading.Thread(target=writer, args=(MASTERLESS_PORTS[0], 'ml_n0', 25))
-        t2 = threading.Thread(target=writer, args=(MASTERLESS_PORTS[2], 'ml_n2', 25))
-        t0.start()
-        t2.start()
-        t0.join()
-        t2.join()
-
-        time.sleep(4)  # Let replication finish
-
-        # Verify: read keys written to Node 0 from Node 2 and vice versa
-        all_ok = True
-        for i in range(25):
-            r = send_req(MASTERLESS_PORTS[2], {'type': 'get', 'key': f'ml_n0_{i}'})
-            if not r or r.get('value') != f'val_{i}':
-                all_ok = False
-                break
-            r = send_req(MASTERLESS_PORTS[0], {'type': 'get', 'key': f'ml_n2_{i}'})
-            if not r or r.get('value') != f'val_{i}':
-                all_ok = False
-                break
+        futures = [_POOL.submit(writer, MASTERLESS_PORTS[0], 'ml_n0', 25),
+                   _POOL.submit(writer, MASTERLESS_PORTS[2], 'ml_n2', 25)]
+        for future in futures:
+            future.result()
+
+        # Verify: read keys written to Node 0 from Node 2 and vice versa,
+        # one multi-get per node with both in flight at once, polling until
+        # replication catches up
+        checks = [(MASTERLESS_PORTS[2], [f'ml_n0_{i}' for i in range(25)]),
+                  (MASTERLESS_PORTS[0], [f'ml_n2_{i}' for i in range(25)])]
+
+        def replicated():
+            replies = send_to_each([(port, {'type': 'mget', 'keys': keys}) for port, keys in checks])
+            for (_, keys), r in zip(checks, replies):
+                values = (r or {}).get('values') or {}
+                if not all(values.get(key) == f'val_{i}' for i, key in enumerate(keys)):
+                    return False
+            return True
+
+        all_ok = wait_until(replicated, timeout=4)
 
         if all_ok and len(errors) == 0:
             results['concurrent_writes_all_nodes'] = True
@@ -416,10 +490,37 @@ def run_masterless_tests():
         else:
             print(f"  ❌ FAILED — errors: {len(errors)}, cross-read ok: {all_ok}")
 
+        # ---------------------------------------------------------
+        # TEST 6: Concurrent writes to ONE node reach its peers
+        # ---------------------------------------------------------
+        print("\n⚡ Test 6: Concurrent writes to Node 0, read from Node 2")
+        errors = []
+
+        # 8 connections, so the node stamps and applies the writes on 8
+        # workers at once; a peer must still get every version
+        futures = [_POOL.submit(writer, MASTERLESS_PORTS[0], f'ml_one_{t_id}', 50) for t_id in range(8)]
+        for future in futures:
+            future.result()
+
+        keys = [f'ml_one_{t_id}_{i}' for t_id in range(8) for i in range(50)]
+
+        def replicated_to_peer():
+            r = send_req(MASTERLESS_PORTS[2], {'type': 'mget', 'keys': keys})
+            values = (r or {}).get('values') or {}
+            return all(values.get(key) == f"val_{key.rsplit('_', 1)[1]}" for key in keys)
+
+        all_ok = wait_until(replicated_to_peer, timeout=4)
+
+        if all_ok and len(errors) == 0:
+            results['concurrent_writes_one_node'] = True
+            print("  ✓ PASSED — 400 concurrent writes to Node 0, all replicated")
+        else:
+            print(f"  ❌ FAILED — errors: {len(errors)}, replicated: {all_ok}")
+
     finally:
+        close_all()
         for p in procs:
             kill_proc(p)
-        time.sleep(1)
 
     return results
 
@@ -448,60 +549,91 @@ def print_comparison(raft_results, masterless_results):
         ("Concurrent multi-node",   masterless_results.get('concurrent_writes_all_nodes', False)),
     ]
 
-    print("\n" + "=" * 70)
-    print("REPLICATION COMPARISON: RAFT vs MASTERLESS")
-    print("=" * 70)
-    print(f"{'Test':<30} | {'Raft':^15} | {'Masterless':^15}")
-    print("-" * 70)
+    out = io.StringIO()  # Whole table reaches stdout in one write
+    print("\n" + "=" * 70, file=out)
+    print("REPLICATION COMPARISON: RAFT vs MASTERLESS", file=out)
+    print("=" * 70, file=out)
+    print(f"{'Test':<30} | {'Raft':^15} | {'Masterless':^15}", file=out)
+    print("-" * 70, file=out)
 
     for (raft_label, raft_pass), (ml_label, ml_pass) in zip(raft_labels, ml_labels):
         raft_status = "✅ PASSED" if raft_pass else "❌ FAILED"
         ml_status   = "✅ PASSED" if ml_pass  else "❌ FAILED"
         # Use the longer label for display
         label = raft_label if len(raft_label) >= len(ml_label) else ml_label
-        print(f"{label:<30} | {raft_status:^15} | {ml_status:^15}")
+        print(f"{label:<30} | {raft_status:^15} | {ml_status:^15}", file=out)
 
-    print("-" * 70)
+    print("-" * 70, file=out)
 
     raft_total = sum(1 for _, p in raft_labels if p)
     ml_total   = sum(1 for _, p in ml_labels if p)
 
-    print(f"{'TOTAL':<30} | {f'{raft_total}/5':^15} | {f'{ml_total}/5':^15}")
-    print("=" * 70)
+    print(f"{'TOTAL':<30} | {f'{raft_total}/5':^15} | {f'{ml_total}/5':^15}", file=out)
+    print("=" * 70, file=out)
 
     # Architecture notes
-    print("\n📖 HOW THEY DIFFER:")
-    print("-" * 70)
-    print("  RAFT (cluster.py):")
-    print("    • One LEADER accepts all writes")
-    print("    • Followers are read-only replicas")
-    print("    • Leader failure → automatic election (5-6 sec)")
-    print("    • Strong consistency — all reads see latest write")
-    print()
-    print("  MASTERLESS (masterless.py):")
-    print("    • ALL nodes accept reads AND writes")
-    print("    • No election needed — no single point of failure")
-    print("    • Conflicts resolved with vector clocks (LWW)")
-    print("    • Eventual consistency — replication is async (50ms)")
-    print("=" * 70)
+    print("\n📖 HOW THEY DIFFER:", file=out)
+    print("-" * 70, file=out)
+    print("  RAFT (cluster.py):", file=out)
+    print("    • One LEADER accepts all writes", file=out)
+    print("    • Followers are read-only replicas", file=out)
+    print("    • Leader failure → automatic election (5-6 sec)", file=out)
+    print("    • Strong consistency — all reads see latest write", file=out)
+    print(file=out)
+    print("  MASTERLESS (masterless.py):", file=out)
+    print("    • ALL nodes accept reads AND writes", file=out)
+    print("    • No election needed — no single point of failure", file=out)
+    print("    • Conflicts resolved with vector clocks (LWW)", file=out)
+    print("    • Eventual consistency — replication is async (50ms)", file=out)
+    print("=" * 70, file=out)
+    sys.stdout.write(out.getvalue())
+    sys.stdout.flush()
 
 
 # ============================================================================
 # MAIN
 # ============================================================================
 
+class _ThreadBufferedStdout:
+    """stdout stand-in that holds each registered thread's prints in its own buffer."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        return getattr(self.local, 'buffer', self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def _run_buffered(phase):
+    """Run phase() with its prints buffered; returns (results, printed text)."""
+    stdout = sys.stdout
+    stdout.local.buffer = io.StringIO()
+    try:
+        return phase(), stdout.local.buffer.getvalue()
+    finally:
+        del stdout.local.buffer
+
+
 if __name__ == "__main__":
     # Clean up old data
+    cleanup_dir("raft_data")
     cleanup_dir("masterless_data")
     cleanup_dir("kvstore_data")
 
-    # Run Raft tests
-    raft_results = run_raft_tests()
-    time.sleep(2)  # Let ports release
-
-    # Run Masterless tests
-    masterless_results = run_masterless_tests()
-    time.sleep(2)
+    # The two phases use disjoint ports and data dirs, so run them side by
+    # side; each one's report is held back and printed whole, in order
+    sys.stdout = _ThreadBufferedStdout(sys.stdout)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        raft_future = pool.submit(_run_buffered, run_raft_tests)
+        masterless_future = pool.submit(_run_buffered, run_masterless_tests)
+        raft_results, raft_output = raft_future.result()
+        masterless_results, masterless_output = masterless_future.result()
+    sys.stdout = sys.stdout.stream
+    print(raft_output + masterless_output, end='')
 
     # Print comparison
     print_comparison(raft_results, masterless_results)
\ No newline at end of file
@@ -2,19 +2,45 @@
 from server import KVStore 
 import shutil
 import socket
-import json
 import threading
 import os
 import time
 import subprocess
+import multiprocessing
 import sys
 
+from codec import loads as _loads
+from test_helpers import _frame, PING_FRAME, close_all, send_to_each
+
 
 # ==========================================
 # HELPER FUNCTIONS
 # ==========================================
 PEERS = [('localhost', 8000), ('localhost', 8001), ('localhost', 8002)]
 
+# Cluster nodes are forked from a server that has already imported cluster.py,
+# skipping interpreter start and imports per node
+if 'forkserver' in multiprocessing.get_all_start_methods():
+    _NODE_CTX = multiprocessing.get_context('forkserver')
+    _NODE_CTX.set_forkserver_preload(['cluster'])
+else:
+    _NODE_CTX = multiprocessing.get_context('spawn')  # Windows
+
+def _run_cluster_node(node_id):
+    """Node process body: run one ClusterNode on PEERS until killed."""
+    from cluster import ClusterNode
+    ClusterNode(node_id, PEERS)
+    while True:
+        time.sleep(1)
+
+# Test data lives on tmpfs where there is one, so fsync and rmtree never touch
+# the disk; KV_TEST_ROOT overrides it
+TEST_ROOT = os.environ.get('KV_TEST_ROOT', '/dev/shm/kv_tests' if os.path.isdir('/dev/shm') else '.')
+
+def data_path(name):
+    """Path of a test data directory under TEST_ROOT."""
+    return os.path.join(TEST_ROOT, name)
+
 def cleanup_dir(path):
     """Robust directory cleanup that retries on Windows PermissionErrors."""
     if not os.path.exists(path):
@@ -31,37 +57,54 @@ def cleanup_dir(path):
 
 def send_req(port, msg):
     """Robust request sender with retry for connection."""
+    backoff = 0.05
     for _ in range(3):
         try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            s.settimeout(2.0)
-            s.connect(('localhost', port))
-            s.sendall(json.dumps(msg).encode() + b'\n')
-            data = s.recv(4096)
+            with socket.create_connection(('localhost', port), timeout=2.0) as s:
+                s.sendall(_frame(msg))
+                # Replies are newline-terminated and may span many recv()s
+                with s.makefile('rb') as reader:
+                    data = reader.readline()
             if not data: return None
-            resp = json.loads(data.decode())
-            s.close()
-            return resp
-        except:
-            time.sleep(0.5)
+            return _loads(data)
+        except OSError:
+            # Refused / reset / timed out: the node may still be coming up
+            time.sleep(backoff)
+            backoff *= 2
+        except ValueError:
+            return None  # Garbled reply; retrying won't fix it
     return None
 
-def find_leader():
-    """Polls cluster nodes to find the current LEADER."""
+def wait_for_port(port, timeout=10):
+    """Poll until a server accepts connections on port; True if one did in time."""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            socket.create_connection(('localhost', port), timeout=1.0).close()
+            return True
+        except OSError:
+            if time.time() >= deadline:
+                return False
+            time.sleep(0.05)
+
+def find_leader(exclude=None):
+    """Polls cluster nodes to find the current LEADER (other than node `exclude`)."""
     print("   (Scanning for leader...)", end=" ", flush=True)
+    candidates = [i for i in range(len(PEERS)) if i != exclude]
     for i in range(10): # Retry loop
-        for node_id, (host, port) in enumerate(PEERS):
-            resp = send_req(port, {'type': 'get', 'key': '__ping__'})
-            
-            # If request accepted (status ok or value found), this is leader
+        replies = send_to_each([(PEERS[n][1], PING_FRAME) for n in candidates])
+        
+        # If request accepted (status ok or value found), this is leader
+        for node_id, resp in zip(candidates, replies):
             if resp and (resp.get('status') == 'ok' or 'value' in resp):
                 print(f"Found Leader: Node {node_id}")
-                return node_id, port
-            
-            # If redirected, we know who the leader is
+                return node_id, PEERS[node_id][1]
+        
+        # If redirected, we know who the leader is
+        for resp in replies:
             if resp and resp.get('status') == 'redirect':
                 leader_id = resp.get('leader_id')
-                if leader_id is not None:
+                if leader_id is not None and leader_id != exclude:
                     print(f"Redirected to Leader: Node {leader_id}")
                     return leader_id, PEERS[leader_id][1]
         time.sleep(1.0)
@@ -74,7 +117,7 @@ def run_basic_tests():
     from server import KVServer
     from client import KVClient
     
-    test_dir = "kvstore_test"
+    test_dir = data_path("kvstore_test")
     test_port = 8010 # Use distinct port
     
     cleanup_dir(test_dir)
@@ -83,7 +126,7 @@ def run_basic_tests():
     server_thread = threading.Thread(target=server.start)
     server_thread.daemon = True
     server_thread.start()
-    time.sleep(1.0)
+    wait_for_port(test_port)
     
     print("\n" + "="*50)
     print("RUNNING BASIC FUNCTIONAL TESTS (Direct Server)")
@@ -105,13 +148,12 @@ def run_basic_tests():
 
         print("\n3. Test: Persistence (Restart)")
         client.close()
-        server.stop()
-        time.sleep(1.0)
+        server.stop()  # Returns once the listener is closed; SO_REUSEADDR frees the port
         
         # Restart
         server = KVServer(port=test_port, data_dir=test_dir)
         threading.Thread(target=server.start, daemon=True).start()
-        time.sleep(1.0)
+        wait_for_port(test_port)
         
         client = KVClient(port=test_port)
         assert client.Get("key1") == "value1"
@@ -133,11 +175,12 @@ def test_concurrent_isolation():
     print("="*50)
     
     port = 8011
-    cleanup_dir("kvstore_bench")
+    data_dir = data_path("kvstore_bench")
+    cleanup_dir(data_dir)
     
-    cmd = [sys.executable, "-c", f"from server import KVServer; s=KVServer(port={port}, data_dir='kvstore_bench'); s.start()"]
+    cmd = [sys.executable, "-c", f"from server import KVServer; s=KVServer(port={port}, data_dir={data_dir!r}); s.start()"]
     proc = subprocess.Popen(cmd)
-    time.sleep(2)
+    wait_for_port(port)
     
     keys = [f"k{i}" for i in range(100)]
     
@@ -157,12 +200,14 @@ def test_concurrent_isolation():
     if not resp or 'value' not in resp:
          print("   FAILURE: Could not read data.")
          proc.kill()
+         proc.wait()
          return
 
     val0 = resp['value']
     if not val0:
         print("   FAILURE: Data missing.")
         proc.kill()
+        proc.wait()
         return
         
     expected_prefix = val0.split('_')[0]
@@ -190,33 +235,34 @@ def test_crash_atomicity():
     print("="*50)
     
     port = 8012
-    cleanup_dir("kvstore_bench")
+    data_dir = data_path("kvstore_bench")
+    cleanup_dir(data_dir)
     
-    cmd = [sys.executable, "-c", f"from server import KVServer; s=KVServer(port={port}, data_dir='kvstore_bench'); s.start()"]
+    cmd = [sys.executable, "-c", f"from server import KVServer; s=KVServer(port={port}, data_dir={data_dir!r}); s.start()"]
     proc = subprocess.Popen(cmd)
-    time.sleep(2)
+    wait_for_port(port)
     
     print("   Initiating massive bulk write...")
-    huge_batch = [{'key': f"ak_{i}", 'value': "x"*100} for i in range(5000)]
+    # 5000 keys ak_0 .. ak_4999, expanded server-side into one bulk_set
+    huge_batch = {'command': 'bulk_set_range', 'prefix': 'ak_', 'count': 5000, 'value': "x"*100}
     
     def killer():
-        time.sleep(0.5) 
         print("   💀 KILLING SERVER with SIGKILL...")
         proc.kill() 
         
-    t = threading.Thread(target=killer)
-    t.start()
+    timer = threading.Timer(0.5, killer)
+    timer.start()
     
     try:
-        send_req(port, {'command': 'bulk_set', 'items': huge_batch})
+        send_req(port, huge_batch)
     except: pass
     
-    t.join()
+    timer.join()
     proc.wait() # Wait for kill to finish
     
     print("   Restarting server to verify WAL Atomicity...")
     proc = subprocess.Popen(cmd)
-    time.sleep(2)
+    wait_for_port(port)
     
     r1 = send_req(port, {'command': 'get', 'key': 'ak_0'})
     r2 = send_req(port, {'command': 'get', 'key': 'ak_4999'})
@@ -238,16 +284,17 @@ def test_chaos_mode():
     print("ACID TEST 3: Chaos Snapshot (Bonus)")
     print("="*50)
     
-    cleanup_dir("kvstore_data/node_chaos")
+    data_dir = data_path("kvstore_data")
+    cleanup_dir(os.path.join(data_dir, "node_chaos"))
     
-    store = KVStore(instance_id="chaos")
+    store = KVStore(data_dir=data_dir, instance_id="chaos")
     store.set("important_key", "my_data")
     
     print("   Attempting Snapshot with simulated disk failure...")
     result = store.save_snapshot(debug_chaos=True)
     print(f"   Snapshot outcome: {result}")
     
-    new_store = KVStore(instance_id="chaos")
+    new_store = KVStore(data_dir=data_dir, instance_id="chaos")
     val = new_store.get("important_key")
     
     if val == "my_data":
@@ -268,8 +315,9 @@ def test_cluster_failover():
     procs = []
     print("   Starting 3-node cluster (Ports 8000, 8001, 8002)...")
     for i in range(3):
-        cmd = [sys.executable, "cluster.py", str(i)]
-        procs.append(subprocess.Popen(cmd))
+        proc = _NODE_CTX.Process(target=_run_cluster_node, args=(i,), daemon=True)
+        proc.start()
+        procs.append(proc)
     
     try:
         lid, lport = find_leader()
@@ -287,9 +335,7 @@ def test_cluster_failover():
         procs[lid].kill()
         
         print("   Waiting for Failover (Election)...")
-        time.sleep(6) 
-        
-        new_lid, new_lport = find_leader()
+        new_lid, new_lport = find_leader(exclude=lid)
         if new_lid is None or new_lid == lid:
             print("   FAILURE: Failover failed.")
         else:
@@ -304,8 +350,9 @@ def test_cluster_failover():
 
     finally:
         print("   Cleaning up processes...")
+        close_all()  # find_leader's pooled connections to the nodes
         for p in procs:
             try: 
                 p.kill()
-                p.wait()
+                p.join()
             except: pass